@@ -0,0 +1,237 @@
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+
+# Offline micro-benchmarks for the solvers and renderers behind the pages.
+# Each case times one call with an automatically chosen loop count (best and
+# median of several repeats); results are written as JSON and compared with a
+# saved baseline, and the run fails when any case is more than --threshold
+# slower than its baseline. Baselines are machine specific, so save one per
+# machine with --save before relying on the gate.
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+DISPATCH_SIZES = (3, 100, 1000, 10_000)
+
+def fleet(n, seed=0):
+    rng = np.random.default_rng(seed)
+    coefficients = np.column_stack([rng.uniform(0.001, 0.01, n), rng.uniform(5, 10, n), rng.uniform(100, 500, n)])
+    p_min, p_max = np.full(n, 10.0), rng.uniform(200, 600, n)
+    return coefficients, p_min, p_max, 0.6 * p_max.sum()
+
+def dispatch_case(n, solver):
+    from dispatch import solve_dispatch
+
+    coefficients, p_min, p_max, demand = fleet(n)
+    return lambda: solve_dispatch(coefficients, demand, solver, p_min, p_max)
+
+def batch_dispatch_case(n, periods):
+    from dispatch import batch_dispatch
+
+    coefficients, p_min, p_max, demand = fleet(n)
+    demands = np.random.default_rng(1).uniform(0.3, 0.9, periods) * p_max.sum()
+    check_balance(batch_dispatch(coefficients, demands, p_min, p_max)[0], demands)
+    return lambda: batch_dispatch(coefficients, demands, p_min, p_max)
+
+def unbounded_dispatch_case(periods):
+    from dispatch import batch_dispatch
+
+    # No upper limits, and the cheapest unit alone can carry the peak before the others start:
+    # the peak period is where the dispatch curve used to overgenerate
+    coefficients = np.array([[0.01, 5, 0], [0.02, 50, 0], [0.005, 8, 0]])
+    demands = np.random.default_rng(1).uniform(10, 100, periods)
+    demands[-1] = 100.0
+    check_balance(batch_dispatch(coefficients, demands)[0], demands)
+    return lambda: batch_dispatch(coefficients, demands)
+
+def check_balance(loads, demands):
+    # A fast but wrong dispatch is not a result: every period has to meet its demand
+    if not np.allclose(loads.sum(axis=1), demands):
+        worst = np.argmax(np.abs(loads.sum(axis=1) - demands))
+        raise ValueError(f'Batch dispatch generates {loads[worst].sum():g} for a demand of {demands[worst]:g}')
+
+def symbolic_case(n):
+    from dispatch import symbolic_model
+
+    coefficients = tuple(map(tuple, fleet(n)[0]))
+    # The uncached build; the cache would turn every call after the first into a lookup
+    return lambda: symbolic_model.__wrapped__(coefficients)
+
+def incremental_cost_case(n):
+    from dispatch import solve_incremental_cost
+
+    coefficients, _, _, demand = fleet(n)
+    coefficients = tuple(map(tuple, coefficients))
+    return lambda: solve_incremental_cost.__wrapped__(coefficients, demand)
+
+RLC = [{'type': 'Resistor', 'value': 10}, {'type': 'Inductor', 'value': 0.05}, {'type': 'Capacitor', 'value': 1e-4}]
+
+def sweep_case(points):
+    import core
+
+    freqs = np.logspace(0, 6, points)
+    return lambda: core.frequency_sweep(RLC, 10.0, freqs)
+
+def imped_case(points):
+    import core
+
+    freqs = np.logspace(0, 6, points)
+    return lambda: core.calculate_imped('Capacitor', 1e-4, freqs)
+
+def matplotlib_phasor_case():
+    import rendering
+
+    figure = rendering.PhasorFigure()
+
+    def run():
+        figure.update((80.0, 20.0), (110.0, 20.0), (110.0, 50.0)).savefig(io.BytesIO(), format='png', dpi=72)
+    return run
+
+def matplotlib_triangle_case():
+    import rendering
+
+    figure = rendering.power_triangle_figure()
+
+    def run():
+        figure.update(86.6, 50.0, 100.0, 30.0).savefig(io.BytesIO(), format='png', dpi=72)
+    return run
+
+def plotly_phasor_case():
+    import rendering
+    return lambda: rendering.plotly_phasor((80.0, 20.0), (110.0, 20.0), (110.0, 50.0)).to_json()
+
+def plotly_triangle_case():
+    import rendering
+    return lambda: rendering.plotly_power_triangle(86.6, 50.0, 100.0, 30.0).to_json()
+
+def schematic_case(count):
+    import schematic
+
+    key = tuple((RLC[i % 3]['type'], RLC[i % 3]['value']) for i in range(count))
+    # The uncached drawing; render_series_svg would turn every call after the first into a lookup
+    return lambda: schematic.draw_series_svg(key)
+
+def cases():
+    # name -> factory; a factory does the imports and setup and returns the timed call
+    registry = {f'dispatch/lambda/n={n}': (lambda n=n: dispatch_case(n, 'Lambda iteration')) for n in DISPATCH_SIZES}
+    registry.update({f'dispatch/slsqp/n={n}': (lambda n=n: dispatch_case(n, 'SLSQP')) for n in (3, 100)})
+    registry['dispatch/batch/n=100x10000'] = lambda: batch_dispatch_case(100, 10_000)
+    registry['dispatch/batch/unbounded/n=3x10000'] = lambda: unbounded_dispatch_case(10_000)
+    registry.update({
+        'disp/symbolic/n=3': lambda: symbolic_case(3),
+        'disp/symbolic/n=50': lambda: symbolic_case(50),
+        'disp/incremental_cost/n=3': lambda: incremental_cost_case(3),
+        'imped/capacitor/1e6': lambda: imped_case(1_000_000),
+        'imped/sweep/1e3': lambda: sweep_case(1_000),
+        'imped/sweep/1e6': lambda: sweep_case(1_000_000),
+        'figure/matplotlib/phasor': matplotlib_phasor_case,
+        'figure/matplotlib/triangle': matplotlib_triangle_case,
+        'figure/plotly/phasor': plotly_phasor_case,
+        'figure/plotly/triangle': plotly_triangle_case,
+        'schematic/series/n=3': lambda: schematic_case(3),
+        'schematic/series/n=20': lambda: schematic_case(20),
+    })
+    return registry
+
+def measure(func, repeat=5, min_time=0.2):
+    # Like timeit's autorange: grow the loop count until one repeat takes min_time
+    func()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= max(2, min(10, int(min_time / max(elapsed, 1e-9)) + 1))
+
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return {'best_s': min(times), 'median_s': statistics.median(times), 'number': number, 'repeat': repeat}
+
+def machine():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+def regressions(results, baseline, threshold):
+    # The gate uses the best time per call, which is the least noisy of the two
+    cases = baseline.get('cases', {})
+    return [name for name, result in results.items()
+            if name in cases and result['best_s'] > cases[name]['best_s'] * (1 + threshold)]
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:7.2f} {unit}'
+    return f'{seconds / 1e-9:7.0f} ns'
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the dispatch, impedance, figure and schematic code')
+    parser.add_argument('-k', '--filter', action='append', help='only run cases containing this text (repeatable)')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per repeat')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown against the baseline')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    registry = cases()
+    names = [name for name in registry if not args.filter or any(text in name for text in args.filter)]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as source:
+            baseline = json.load(source)
+        if baseline.get('machine') != machine():
+            print(f'warning: {args.baseline} was saved on a different machine or environment', file=sys.stderr)
+
+    results = {}
+    print(f"{'case':<40} {'best':>10} {'median':>10} {'baseline':>10} {'change':>8}")
+    for name in names:
+        results[name] = result = measure(registry[name](), args.repeat, args.min_time)
+        base = baseline.get('cases', {}).get(name)
+        change = f"{result['best_s'] / base['best_s'] - 1:+8.1%}" if base else f"{'new':>8}"
+        print(f"{name:<40} {format_time(result['best_s'])} {format_time(result['median_s'])} "
+              f"{format_time(base['best_s']) if base else '':>10} {change}", flush=True)
+
+    report = {'machine': machine(), 'time': time.time(), 'cases': results}
+    if args.output:
+        with open(args.output, 'w') as out:
+            json.dump(report, out, indent=2)
+
+    if args.save:
+        # Cases that were filtered out keep their previous baseline
+        report['cases'] = dict(baseline.get('cases', {}), **results)
+        with open(args.baseline, 'w') as out:
+            json.dump(report, out, indent=2)
+        print(f'Saved baseline for {len(results)} cases to {args.baseline}')
+        return 0
+
+    slower = regressions(results, baseline, args.threshold)
+    if slower:
+        print(f"Slower than baseline by more than {args.threshold:.0%}: {', '.join(slower)}")
+    return 1 if slower else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
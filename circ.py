@@ -1,73 +1,261 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon
-import schemdraw
-import schemdraw.elements as elm
-
-def draw_circuit(components, voltage):
-    d = schemdraw.Drawing()
-    st.set_option('deprecation.showPyplotGlobalUse', False)
-    
-    comMap = {
-        'Resistor': (elm.Resistor, 'Ω'),
-        'Inductor': (elm.Inductor, 'H'),
-        'Capacitor': (elm.Capacitor, 'F')
-    }
-
-    totImp = 0
-    for i, component in enumerate(components):
-        compType, compVal = component['type'], component['value']
-        compClass, compUnit = comMap[compType]
-        
-        if i > 0:
-            d.add(elm.Dot())
-
-        compInst = compClass(label=f'{compVal}{compUnit}')
-        d.add(compInst)
-
-        imped = calculate_imped(compType, compVal)
-        totImp += imped
-
-    d.add(elm.SourceV(label=f'{voltage}V'))
-    d.draw()
-
-    return totImp
-
-def calculate_imped(compType, compVal):
-    omega = 2 * 3.14159265358979323846 
-
-    if compType == 'Resistor':
-        imped = compVal
-    elif compType == 'Inductor':
-        imped = complex(0, omega * compVal)
-    elif compType == 'Capacitor':
-        imped = complex(0, -1 / (omega * compVal))
+import pandas as pd
+from matplotlib.figure import Figure
+import circuit_ui
+import core
+import harmonics
+import metrics
+import mna
+import rendering
+import tolerance
+
+def plot_bode(freqs, totImp, current, phase):
+    with metrics.stage('figure'):
+        fig = Figure(figsize=(8, 6))
+        ax_mag, ax_phase = fig.subplots(2, 1, sharex=True)
+        ax_mag.loglog(freqs, np.abs(totImp), label='|Z| (Ω)')
+        ax_mag.loglog(freqs, current, label='|I| (A)')
+        ax_mag.set_ylabel('Magnitude')
+        ax_mag.grid(which='both', linestyle='--', linewidth=0.5)
+        ax_mag.legend()
+
+        ax_phase.semilogx(freqs, phase)
+        ax_phase.set_xlabel('Frequency (Hz)')
+        ax_phase.set_ylabel('Phase of Z (deg)')
+        ax_phase.grid(which='both', linestyle='--', linewidth=0.5)
+
+    with metrics.stage('render'):
+        st.pyplot(fig)
+
+def sweep_section(components, voltage):
+    f_start = st.number_input('Sweep Start Frequency (Hz)', min_value=1e-3, value=1.0)
+    f_stop = st.number_input('Sweep Stop Frequency (Hz)', min_value=1e-3, value=1e6)
+    points = st.number_input('Sweep Points', min_value=2, step=1000, value=100000)
+
+    freqs = np.logspace(np.log10(f_start), np.log10(max(f_stop, f_start * 10)), int(points))
+    with metrics.stage('compute'):
+        totImp, current, phase = core.frequency_sweep(components, voltage, freqs)
+    for freq in core.find_resonance(freqs, totImp):
+        st.write(f'Resonance at {freq:.4g} Hz')
+    plot_bode(freqs, totImp, current, phase)
+
+DEFAULT_SPECTRUM = {'order': [3, 5, 7, 11, 13], 'magnitude (%)': [2.0, 4.0, 3.0, 1.5, 1.0], 'phase (deg)': 0.0}
+
+def plot_power_triangle(p, q, s, angle, d=None):
+    with metrics.stage('figure'):
+        fig = rendering.plotly_power_triangle(p, q, s, angle, d)
+    with metrics.stage('render'):
+        st.plotly_chart(fig)
+
+def percent(value):
+    return 'undefined' if np.ma.is_masked(value) else f'{float(value) * 100:.2f} %'
+
+def spectrum_editor(key):
+    # Harmonic content of the distorted sources relative to their fundamental
+    f0 = st.number_input('Fundamental Frequency (Hz)', min_value=0.1, value=50.0, key=f'f0_{key}')
+    max_order = st.number_input('Highest Harmonic Order', min_value=1, max_value=harmonics.MAX_ORDER, step=1,
+                                value=harmonics.MAX_ORDER, key=f'max_order_{key}')
+    table = st.data_editor(pd.DataFrame(DEFAULT_SPECTRUM), num_rows='dynamic', key=f'spectrum_{key}', column_config={
+        'order': st.column_config.NumberColumn('order', min_value=2, max_value=harmonics.MAX_ORDER, step=1,
+                                               required=True),
+        'magnitude (%)': st.column_config.NumberColumn('magnitude (%)', min_value=0.0, required=True),
+        'phase (deg)': st.column_config.NumberColumn('phase (deg)'),
+    })
+    table = table.dropna(subset=['order', 'magnitude (%)'])
+    spectrum = harmonics.harmonic_spectrum(table['order'].to_numpy(dtype=int),
+                                           table['magnitude (%)'].to_numpy(dtype=float) / 100,
+                                           table['phase (deg)'].fillna(0).to_numpy(dtype=float), int(max_order))
+    return f0, spectrum
+
+def harmonic_results(orders, V, I):
+    triangle = core.distorted_power_triangle(V, I)
+    st.write(f"THD: V {percent(triangle['thd_v'])}, I {percent(triangle['thd_i'])}")
+    st.write(f"Vrms: {triangle['vrms']:.2f} V, Irms: {triangle['irms']:.2f} A, "
+             f"Power factor: {np.ma.filled(triangle['pf'], np.nan):.4f}")
+    st.write(f"P: {triangle['p']:.2f} W, Q: {triangle['q']:.2f} var, D: {triangle['d']:.2f} VA, "
+             f"S: {triangle['s']:.2f} VA")
+
+    present = (np.abs(V) > 0) | (np.abs(I) > 0)
+    st.dataframe(pd.DataFrame({
+        '|V| (V)': np.abs(V[present]), '|I| (A)': np.abs(I[present]),
+        'P (W)': (V * np.conj(I)).real[present], 'Q (var)': (V * np.conj(I)).imag[present],
+    }, index=pd.Index(orders[present], name='order')))
+
+    # The triangle's angle is the true power factor angle, which includes the distortion
+    angle = np.degrees(np.arccos(np.clip(np.ma.filled(triangle['pf'], 1.0), -1, 1)))
+    st.subheader('Power Triangle')
+    plot_power_triangle(float(triangle['p']), float(triangle['q']), float(triangle['s']), float(angle),
+                        float(triangle['d']))
+
+def harmonic_section(components, voltage):
+    f0, spectrum = spectrum_editor('series')
+    with metrics.stage('compute'):
+        result = harmonics.series_harmonics(components, voltage, f0, spectrum)
+    harmonic_results(result['orders'], result['V'], result['I'])
+
+def netlist_harmonic_section(netlist):
+    sources = [comp['name'] for comp in netlist if comp['type'] in mna.SOURCES]
+    if not sources:
+        st.write('Harmonic analysis needs at least one source')
+        return
+    f0, spectrum = spectrum_editor('netlist')
+    distorted = st.multiselect('Distorted Sources', sources, default=sources)
+
+    try:
+        with metrics.stage('compute'):
+            result = harmonics.netlist_harmonics(netlist, f0, spectrum, distorted)
+    except (ValueError, np.linalg.LinAlgError) as exc:
+        st.write(f'Harmonic analysis failed: {exc}')
+        return
+
+    st.subheader('Node Voltage Distortion')
+    node_voltages = result['node_voltages']
+    st.dataframe(pd.DataFrame({
+        'node': result['node_names'],
+        'rms (V)': np.sqrt(np.sum(np.abs(node_voltages) ** 2, axis=-1)),
+        'THD (%)': np.ma.filled(core.total_harmonic_distortion(node_voltages).astype(float), np.nan) * 100,
+    }))
+
+    element = st.selectbox('Element', result['branch_names'])
+    k = result['branch_names'].index(element)
+    # Power absorbed by a passive element, and for a source the power it delivers
+    current = -result['currents'][k] if netlist[k]['type'] in mna.SOURCES else result['currents'][k]
+    harmonic_results(result['orders'], result['voltages'][k], current)
+
+def tolerance_editor(names, key):
+    # One row per component: tolerance in percent and its distribution
+    table = st.data_editor(pd.DataFrame({'component': names, 'tolerance (%)': 5.0, 'distribution': 'uniform'}),
+                           key=f'tolerance_{key}', disabled=['component'], column_config={
+        'tolerance (%)': st.column_config.NumberColumn('tolerance (%)', min_value=0.0, max_value=100.0),
+        'distribution': st.column_config.SelectboxColumn('distribution', options=list(tolerance.DISTRIBUTIONS),
+                                                         required=True),
+    })
+    return table['tolerance (%)'].fillna(0).to_numpy(dtype=float) / 100, table['distribution'].fillna('uniform').to_numpy()
+
+def percentile_table(samples, columns):
+    bands = tolerance.percentile_bands(samples)
+    return pd.DataFrame(bands, index=[f'p{p}' for p in tolerance.PERCENTILES], columns=columns)
+
+def histogram_chart(samples, label):
+    counts, centers = tolerance.histogram(samples)
+    st.bar_chart(pd.DataFrame({'samples': counts}, index=pd.Index(np.round(centers, 6), name=label)))
+
+def tolerance_section(components, voltage):
+    names = [f"{component['type']} {k + 1} ({component['value']:.4g})" for k, component in enumerate(components)]
+    tolerances, distributions = tolerance_editor(names, 'series')
+    samples = st.number_input('Monte Carlo Samples', min_value=100, step=100000, value=1000000)
+
+    with metrics.stage('compute'):
+        result = tolerance.series_monte_carlo(components, voltage, tolerances, distributions, int(samples))
+    magnitudes = np.column_stack((np.abs(result['imped']), np.abs(result['current'])))
+    st.dataframe(percentile_table(magnitudes, ['|Z| (Ω)', '|I| (A)']))
+    histogram_chart(magnitudes[:, 0], '|Z| (Ω)')
+    histogram_chart(magnitudes[:, 1], '|I| (A)')
+
+def netlist_tolerance_section(netlist):
+    passive = [k for k, comp in enumerate(netlist) if comp['type'] in mna.PASSIVE]
+    tolerances, distributions = tolerance_editor([netlist[k]['name'] for k in passive], 'netlist')
+    samples = st.number_input('Monte Carlo Samples', min_value=100, step=10000, value=100000)
+
+    # Sources keep their nominal value
+    full_tolerances = np.zeros(len(netlist))
+    full_tolerances[passive] = tolerances
+    full_distributions = np.full(len(netlist), 'uniform', dtype=object)
+    full_distributions[passive] = distributions
+
+    try:
+        with metrics.stage('compute'):
+            result = tolerance.netlist_monte_carlo(netlist, full_tolerances, full_distributions.astype(str), int(samples))
+    except (ValueError, np.linalg.LinAlgError) as exc:
+        st.write(f'Tolerance analysis failed: {exc}')
+        return
+
+    st.subheader('Node Voltage Percentiles (V)')
+    st.dataframe(percentile_table(np.abs(result['voltages']), result['node_names']))
+    st.subheader('Branch Current Percentiles (A)')
+    st.dataframe(percentile_table(np.abs(result['currents']), result['branch_names']))
+    node = st.selectbox('Histogram Node', result['node_names'])
+    histogram_chart(np.abs(result['voltages'][:, result['node_names'].index(node)]), f'|V({node})| (V)')
+
+def netlist_section(netlist, key):
+    if netlist:
+        default = pd.DataFrame({
+            'name': [comp['name'] for comp in netlist],
+            'type': [comp['type'] for comp in netlist],
+            'node1': [comp['nodes'][0] for comp in netlist],
+            'node2': [comp['nodes'][1] for comp in netlist],
+            'value': [comp['value'] for comp in netlist],
+        })
     else:
-        imped = 0
+        default = pd.DataFrame({
+            'name': ['V1', 'R1', 'L1', 'C1'],
+            'type': ['VoltageSource', 'Resistor', 'Inductor', 'Capacitor'],
+            'node1': ['1', '1', '2', '2'],
+            'node2': ['0', '2', '0', '0'],
+            'value': [10.0, 100.0, 0.01, 0.001],
+        })
+    table = st.data_editor(default, num_rows='dynamic', key=f'netlist_{key}', column_config={
+        'type': st.column_config.SelectboxColumn('type', options=list(mna.PASSIVE + mna.SOURCES), required=True),
+    })
+    table = table.dropna()
+    netlist = [{'name': row.name, 'type': row.type, 'nodes': (str(row.node1), str(row.node2)), 'value': float(row.value)}
+               for row in table.itertuples(index=False)]
+    if not netlist:
+        return
+
+    try:
+        with metrics.stage('compute'):
+            result = mna.solve_netlist(netlist)
+    except (ValueError, RuntimeError) as exc:
+        st.write(f'Circuit could not be solved: {exc}')
+        return
 
-    return imped
+    st.subheader('Node Voltages')
+    st.dataframe(pd.DataFrame({
+        'node': result['node_names'],
+        'magnitude (V)': np.abs(result['voltages']),
+        'phase (deg)': np.degrees(np.angle(result['voltages'])),
+    }))
+    st.subheader('Branch Currents')
+    st.dataframe(pd.DataFrame({
+        'branch': result['branch_names'],
+        'magnitude (A)': np.abs(result['currents']),
+        'phase (deg)': np.degrees(np.angle(result['currents'])),
+    }))
+    if st.checkbox('Tolerance Analysis'):
+        netlist_tolerance_section(netlist)
+    if st.checkbox('Harmonic Analysis'):
+        netlist_harmonic_section(netlist)
 
 def main():
         st.title('Circuit Diagram Generator and Solver')
-        st.sidebar.header('Number of Components')
-        num_components = st.sidebar.number_input('Number of Components', min_value=1, step=1, value=1)
-        components = []
-        for i in range(num_components):
-            st.sidebar.subheader(f'Component {i + 1}')
-            compType = st.sidebar.selectbox(f'Select Component Type {i + 1}', ['Resistor', 'Inductor', 'Capacitor'])
-            compVal = st.sidebar.number_input(f'{compType} Value {i + 1} ({compType})', min_value=0.001, step=0.001, value=0.01)
-            components.append({'type': compType, 'value': compVal})
-        voltage = st.number_input('Enter Voltage Across the Circuit (V)', min_value=0, step=1, value=10)
-        totImp = draw_circuit(components, voltage)
+        mode = st.sidebar.radio('Circuit Input', ['Series Chain', 'Netlist (MNA)'])
+        netlist, key = circuit_ui.load_netlist(st.sidebar.file_uploader('Upload SPICE Netlist', type=['cir', 'sp', 'net', 'txt']))
+        if mode == 'Netlist (MNA)':
+            netlist_section(netlist, key)
+            return
+
+        components = circuit_ui.components_editor(netlist, key)
+        if not components:
+            return
+        voltage = st.number_input('Enter Voltage Across the Circuit (V)', min_value=0.0, step=1.0, value=circuit_ui.source_voltage(netlist))
+        totImp = circuit_ui.draw_circuit(components, voltage)
         current = voltage / totImp
         st.write(f'Total imped: {totImp:.2f} Ω')
         st.write(f'Current: {current:.2f} A')
-        st.pyplot()
+        if st.checkbox('Frequency Sweep'):
+            sweep_section(components, voltage)
+        if st.checkbox('Tolerance Analysis'):
+            tolerance_section(components, voltage)
+        if st.checkbox('Harmonic Analysis'):
+            harmonic_section(components, voltage)
 
 
 if __name__ == '__main__':
-    main()
+    with metrics.rerun('circ'):
+        main()
+    metrics.panel()
 
 # Copyright text at the bottom
 st.sidebar.markdown(
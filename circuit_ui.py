@@ -0,0 +1,74 @@
+import streamlit as st
+from functools import partial
+import core
+import metrics
+import offload
+
+# Circuit inputs and the series schematic shared by the circuit pages (circ.py
+# and the circuit generator of test5.py). pandas, mna and schematic are imported
+# inside the functions, so test5 still only loads them once its circuit page opens.
+
+def load_netlist(uploaded):
+    import mna
+
+    # Parse each uploaded file once per session; the parser streams the file line by line
+    if uploaded is None:
+        return [], None
+    key = uploaded.file_id
+    if st.session_state.get('netlist_key') != key:
+        uploaded.seek(0)
+        try:
+            st.session_state['netlist'] = list(mna.parse_spice(uploaded))
+        except (ValueError, UnicodeDecodeError) as exc:
+            st.sidebar.write(f'Netlist not loaded: {exc}')
+            st.session_state['netlist'] = []
+        st.session_state['netlist_key'] = key
+    return st.session_state['netlist'], key
+
+def components_editor(netlist, key):
+    import pandas as pd
+    import mna
+
+    # Passive elements of an uploaded netlist, in file order, become the series chain
+    components = [{'type': comp['type'], 'value': comp['value']} for comp in netlist if comp['type'] in mna.PASSIVE]
+    if not components:
+        components = [{'type': 'Resistor', 'value': 0.01}]
+
+    st.sidebar.header('Components')
+    table = st.sidebar.data_editor(pd.DataFrame(components), num_rows='dynamic', key=f'components_{key}', column_config={
+        'type': st.column_config.SelectboxColumn('type', options=list(mna.PASSIVE), required=True),
+        'value': st.column_config.NumberColumn('value', min_value=0.001, step=0.001, format='%.4g', required=True),
+    })
+    table = table.dropna()
+    return [{'type': row.type, 'value': float(row.value)} for row in table.itertuples(index=False)]
+
+def source_voltage(netlist, default=10.0):
+    sources = [comp['value'] for comp in netlist if comp['type'] == 'VoltageSource']
+    return float(sources[0]) if sources else default
+
+def draw_circuit(components, voltage, graph=None):
+    import schematic
+
+    # With the page's stages.StageGraph the impedance is only recomputed when the components change
+    with metrics.stage('compute'):
+        if graph is not None:
+            totImp = graph.run('circuit/impedance', core.series_impedance, components)
+        else:
+            totImp = core.series_impedance(components)
+
+    # The SVG is cached on the component tuple, so only topology or value edits redraw,
+    # and those are drawn in the shared process pool
+    try:
+        with metrics.stage('figure'):
+            svg = schematic.render_series_svg(schematic.series_key(components),
+                                              partial(offload.run_in_page, label='Drawing', timeout=10.0))
+    except offload.JOB_ERRORS as exc:
+        st.write(f'Circuit diagram not drawn: {exc}')
+    else:
+        with metrics.stage('render'):
+            st.image(svg, caption=f'Source: {voltage} V')
+    stats = schematic.cache_stats()
+    st.sidebar.caption(f"Diagram cache: {stats['hits']} hits, {stats['misses']} misses, "
+                       f"{stats['size']}/{stats['maxsize']} entries")
+
+    return totImp
@@ -0,0 +1,97 @@
+import numpy as np
+
+# Calculations shared by the Streamlit pages, kept free of Streamlit, matplotlib
+# and schemdraw so batch jobs can import them on their own. Every function takes
+# scalars or NumPy arrays and broadcasts them against each other.
+
+COMPONENT_TYPES = ('Resistor', 'Inductor', 'Capacitor')
+
+def calculate_power_triangle(voltage, current, phase_angle):
+    s = np.multiply(voltage, current, dtype=float)
+    angle_rad = np.radians(phase_angle)
+    p = s * np.cos(angle_rad)
+    q = s * np.sin(angle_rad)
+    return p, q, s
+
+def calculate_imped_triangle(voltage, current, phase_angle):
+    # Rows with current == 0 have no defined impedance and come back masked
+    imped = np.ma.divide(np.asarray(voltage, dtype=float), np.asarray(current, dtype=float))
+    angle_rad = np.radians(phase_angle)
+    res = imped * np.cos(angle_rad)
+    reac = imped * np.sin(angle_rad)
+    return res, reac, np.ma.abs(imped)
+
+def calculate_imped(compType, compVal, freq=1.0):
+    # freq may be a scalar or a NumPy array of frequencies in Hz
+    omega = 2 * np.pi * np.asarray(freq, dtype=float)
+
+    if compType == 'Resistor':
+        imped = compVal + 0 * omega
+    elif compType == 'Inductor':
+        imped = 1j * omega * compVal
+    elif compType == 'Capacitor':
+        imped = -1j / (omega * compVal)
+    else:
+        imped = 0 * omega
+
+    return imped
+
+def series_impedance(components, freq=1.0):
+    # Series elements of one type collapse to a single equivalent value, so any
+    # number of frequencies is one broadcast per type
+    values = {compType: np.array([c['value'] for c in components if c['type'] == compType], dtype=float)
+              for compType in COMPONENT_TYPES}
+    totImp = calculate_imped('Resistor', values['Resistor'].sum(), freq) \
+        + calculate_imped('Inductor', values['Inductor'].sum(), freq)
+    if len(values['Capacitor']):
+        totImp = totImp + calculate_imped('Capacitor', 1 / np.sum(1 / values['Capacitor']), freq)
+    return totImp
+
+def frequency_sweep(components, voltage, freqs):
+    totImp = series_impedance(components, freqs)
+    current = voltage / np.abs(totImp)
+    phase = np.degrees(np.angle(totImp))
+    return totImp, current, phase
+
+def find_resonance(freqs, totImp):
+    # Resonance where the reactance changes sign, interpolated on the log-frequency axis
+    reac = totImp.imag
+    idx = np.flatnonzero(np.sign(reac[:-1]) * np.sign(reac[1:]) < 0)
+    logf = np.log10(freqs)
+    frac = reac[idx] / (reac[idx] - reac[idx + 1])
+    return 10 ** (logf[idx] + frac * (logf[idx + 1] - logf[idx]))
+
+def phasor_points(Vr, angle, current, resistance=1.0, reactance=1.0):
+    # Short-line phasor tips: Vr, then the I*R drop along the current (reference
+    # axis) and the I*X drop in quadrature; Vs runs from the origin to Ix
+    angle_rad = np.radians(angle)
+    Vr_x = Vr * np.cos(angle_rad)
+    Vr_y = Vr * np.sin(angle_rad)
+
+    Ir_x = Vr_x + np.multiply(current, resistance)
+    Ir_y = Vr_y + 0 * Ir_x
+
+    Ix_x = Ir_x
+    Ix_y = Ir_y + np.multiply(current, reactance)
+    return Vr_x, Vr_y, Ir_x, Ir_y, Ix_x, Ix_y
+
+def total_harmonic_distortion(phasors):
+    # Harmonic order on the last axis, fundamental first; masked where the fundamental is zero
+    power = np.abs(phasors) ** 2
+    return np.ma.divide(np.sqrt(power[..., 1:].sum(axis=-1)), np.sqrt(power[..., 0]))
+
+def distortion_power(p, q, s):
+    # Budeanu distortion power: the part of S that neither P nor Q accounts for
+    return np.sqrt(np.maximum(np.square(s) - np.square(p) - np.square(q), 0.0))
+
+def distorted_power_triangle(V, I):
+    # V and I are RMS phasors with the harmonic order on the last axis. P and Q add up
+    # order by order, while S = Vrms * Irms also holds the cross-order products, which are D
+    vrms = np.sqrt(np.sum(np.abs(V) ** 2, axis=-1))
+    irms = np.sqrt(np.sum(np.abs(I) ** 2, axis=-1))
+    power = V * np.conj(I)
+    p, q, s = power.real.sum(axis=-1), power.imag.sum(axis=-1), vrms * irms
+    return {
+        'vrms': vrms, 'irms': irms, 'p': p, 'q': q, 's': s, 'd': distortion_power(p, q, s),
+        'pf': np.ma.divide(p, s), 'thd_v': total_harmonic_distortion(V), 'thd_i': total_harmonic_distortion(I),
+    }
@@ -1,97 +1,96 @@
 import streamlit as st
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon
-import schemdraw
-import schemdraw.elements as elm
-import sympy as sp
-
-def draw_phasor_diagram(Vr, angle, resistance, reactance, current):
-    # Convert angle to radians
-    angle_rad = np.radians(angle)
-    st.set_option('deprecation.showPyplotGlobalUse', False)
-    # Calculate the coordinates for Vs, Ir, and Ix
-    Vs_x = 0
-    Vs_y = 0
-
-    Vr_x = Vr * np.cos(angle_rad)
-    Vr_y = Vr * np.sin(angle_rad)
-
-    Ir_x = Vr_x + current
-    Ir_y = Vr_y
-
-    Ix_x = Ir_x
-    Ix_y = Ir_y + current
-
-    # Plot the phasor diagram
-    plt.figure(figsize=(8, 8))
-
-    # Plotting Vs vector with arrow
-    plt.arrow(0, 0, Ix_x, Ix_y, head_width=0.5, head_length=0.5, fc='blue', ec='blue', label='Vs')
-
-    # Plotting Vr vector with arrow
-    plt.arrow(0, 0, Vr_x, Vr_y, head_width=0.5, head_length=0.5, fc='green', ec='green', label='Vr')
-
-    plt.arrow(Vr_x, Vr_y, Ir_x - Vr_x, Ir_y - Vr_y, head_width=0.5, head_length=0.5, fc='red', ec='red', label='Ir')
-
-    plt.arrow(Ir_x, Ir_y, Ix_x - Ir_x, Ix_y - Ir_y, head_width=0.5, head_length=0.5, fc='purple', ec='purple', label='Ix')
-
-    # Add labels and legend
-    plt.text(Vr_x / 2, Vr_y / 2, 'Vr', color='green', fontsize=12, ha='right', va='bottom')
-    plt.text((Ir_x + Vr_x) / 2, (Ir_y + Vr_y) / 2, 'Ir', color='red', fontsize=12, ha='right', va='bottom')
-    plt.text((Ix_x + Ir_x) / 2, (Ix_y + Ir_y) / 2, 'Ix', color='purple', fontsize=12, ha='right', va='bottom')
-    plt.text(Ix_x / 2, Ix_y / 2, 'Vs', color='blue', fontsize=12, ha='right', va='bottom')
-
-    plt.xlabel('Real')
-    plt.ylabel('Imaginary')
-    plt.title('Phasor Diagram')
-    plt.axhline(0, color='black', linewidth=0.5)
-    plt.axvline(0, color='black', linewidth=0.5)
-    plt.grid(color='gray', linestyle='--', linewidth=0.5)
-    plt.legend()
-    st.pyplot()
+import core
+import dispatch
+import metrics
+import offload
+import rendering
+
+def draw_phasor_diagram(Vr, angle, resistance, reactance, current, renderer='Plotly'):
+    # Calculate the coordinates for Vr, Ir and Ix
+    with metrics.stage('compute'):
+        Vr_x, Vr_y, Ir_x, Ir_y, Ix_x, Ix_y = core.phasor_points(Vr, angle, current)
+
+    if renderer == 'Plotly':
+        with metrics.stage('figure'):
+            fig = rendering.plotly_phasor((Vr_x, Vr_y), (Ir_x, Ir_y), (Ix_x, Ix_y))
+        with metrics.stage('render'):
+            st.plotly_chart(fig)
+        return
+
+    # Plot the phasor diagram on this session's figure, moving the existing artists
+    phasor = rendering.session_figure(st.session_state, 'phasor_figure', rendering.PhasorFigure)
+    with metrics.stage('figure'):
+        fig = phasor.update((Vr_x, Vr_y), (Ir_x, Ir_y), (Ix_x, Ix_y))
+    with metrics.stage('render'):
+        st.pyplot(fig)
+
+# Loads up to which the symbolic model is built in this process; it takes a few ms
+# at that size, less than a round trip to the pool
+SYMBOLIC_INLINE_LOADS = 100
+
+def symbolic_equations(coefficients):
+    if len(coefficients) <= SYMBOLIC_INLINE_LOADS:
+        return dispatch.symbolic_model(coefficients)
+
+    # Built in the shared process pool: sympy on a long list of loads would hold this session's thread.
+    # The page script runs as a fresh module on every rerun, so the result is kept in the session state
+    cached = st.session_state.get('symbolic_equations')
+    if cached is None or cached[0] != coefficients:
+        cached = (coefficients, offload.run_in_page(dispatch.symbolic_model, coefficients,
+                                                    label='Building the symbolic model'))
+        st.session_state['symbolic_equations'] = cached
+    return cached[1]
 
 def main():
         st.title("Economic Load Dispatch")
 
         nod = st.number_input("Enter the number of loads:")
+        demand = st.number_input("Enter the total demand:")
 
         nod = int(nod)
 
-        equations = []
-        eqn = []
-
-        pi, ambda = sp.symbols('pi ambda')  # Define symbolic variables
-
+        coefficients = []
         for i in range(nod):
             st.subheader(f"Load {i + 1}")
             ai = st.number_input(f"Enter variable coefficient one for Load {i + 1}: ")
             bi = st.number_input(f"Enter variable coefficient two for Load {i + 1}: ")
             ci = st.number_input(f"Enter variable coefficient three for Load {i + 1}: ")
-
-            equation = ai * pi**2 + bi * pi + ci  # Define the equation
-            eqn = 2 * ai * pi + bi - ambda  # Define the differential equation
-            equations.append(equation)
-
-        # Display the equations
-        st.subheader("Equations:")
-        for equation in equations:
-            st.write(equation)
-
-        st.subheader("Differential Equation:")
-        st.write(eqn)
-
-        # Solve the differential equation for pi and ambda
-        solution = sp.solve(eqn, (pi, ambda))
+            coefficients.append((ai, bi, ci))
+        coefficients = tuple(coefficients)
+
+        # The symbolic model is only built (and sympy only imported) when asked for
+        if st.checkbox("Show symbolic equations"):
+            try:
+                with metrics.stage('compute'):
+                    equations, differentials = symbolic_equations(coefficients)
+            except offload.JOB_ERRORS as exc:
+                st.write(f"Symbolic model not built: {exc}")
+            else:
+                st.subheader("Equations:")
+                for equation in equations:
+                    st.write(equation)
+
+                st.subheader("Differential Equations:")
+                for differential in differentials:
+                    st.write(differential)
+
+        # Solve the equal incremental cost system for pi and ambda
+        with metrics.stage('compute'):
+            pi, ambda = dispatch.solve_incremental_cost(coefficients, demand)
 
         st.subheader("Solution:")
-        st.write(f"pi = {solution[0][0]}, ambda = {solution[0][1]}")
-
-        # Draw phasor diagram
+        if pi is None:
+            st.write("Solution not found")
+        else:
+            for i, load in enumerate(pi):
+                st.write(f"P{i + 1} = {load}")
+            st.write(f"ambda = {ambda}")
 
 
 if __name__ == '__main__':
-    main()
+    with metrics.rerun('disp'):
+        main()
+    metrics.panel()
 
 # Copyright text at the bottom
 st.markdown(
@@ -0,0 +1,383 @@
+import time
+from functools import lru_cache
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import minimize, milp, Bounds, LinearConstraint, OptimizeResult
+
+# Economic dispatch solvers used by eco3.py, kept free of Streamlit so batch
+# jobs and the compute service can import them directly
+
+def objective(loads, coefficients):
+    a, b, c = coefficients.T
+    return np.sum((a * loads + b) * loads + c)
+
+def objective_jac(loads, coefficients):
+    return 2 * coefficients[:, 0] * loads + coefficients[:, 1]
+
+def equality_constraint(loads, total_sum):
+    return np.sum(loads) - total_sum
+
+def equality_constraint_jac(loads, total_sum):
+    return np.ones_like(loads)
+
+def lambda_dispatch(coefficients, total_sum, p_min=None, p_max=None, tol=1e-10, max_iter=200, lam0=None):
+    coefficients = np.asarray(coefficients, dtype=float).reshape(-1, 3)
+    a, b = coefficients[:, 0], coefficients[:, 1]
+    n = len(a)
+    p_min = np.zeros(n) if p_min is None else np.broadcast_to(np.asarray(p_min, dtype=float), (n,))
+    p_max = np.full(n, np.inf) if p_max is None else np.broadcast_to(np.asarray(p_max, dtype=float), (n,))
+
+    if n == 0 or np.any(a <= 0):
+        raise ValueError("Lambda iteration needs strictly convex quadratic costs (a > 0)")
+    if total_sum < p_min.sum() or total_sum > p_max.sum():
+        raise ValueError("Demand is outside the combined generator limits")
+
+    # Bracket lambda: every unit sits at its minimum at lam_lo and reaches
+    # its maximum (or the whole demand if unbounded) at lam_hi
+    upper = np.where(np.isfinite(p_max), p_max, p_min + total_sum)
+    lam_lo = np.min(b + 2 * a * p_min)
+    lam_hi = np.max(b + 2 * a * upper)
+
+    # Newton steps on the equal incremental cost 2*a*P + b = lambda: the total
+    # output is piecewise linear in lambda, so a step is exact within a segment,
+    # and a step that leaves the bracket falls back to bisection. A warm start
+    # from the previous lambda (lam0) usually needs one or two steps.
+    lam = 0.5 * (lam_lo + lam_hi) if lam0 is None else min(max(lam0, lam_lo), lam_hi)
+    for _ in range(max_iter):
+        loads = np.clip((lam - b) / (2 * a), p_min, p_max)
+        mismatch = total_sum - loads.sum()
+        if mismatch > 0:
+            lam_lo = lam
+        else:
+            lam_hi = lam
+        if abs(mismatch) <= tol * max(1.0, abs(total_sum)) or lam_hi - lam_lo <= tol * max(1.0, abs(lam)):
+            break
+
+        free = (loads > p_min) & (loads < p_max)
+        slope = np.sum(1 / (2 * a[free]))
+        step = lam + mismatch / slope if slope > 0 else np.nan
+        lam = step if lam_lo < step < lam_hi else 0.5 * (lam_lo + lam_hi)
+
+    loads = np.clip((lam - b) / (2 * a), p_min, p_max)
+
+    # Close the remaining mismatch exactly on the units that are not at a limit
+    free = (loads > p_min) & (loads < p_max)
+    if free.any():
+        slope = 1 / (2 * a[free])
+        delta = (total_sum - loads.sum()) / slope.sum()
+        loads[free] += delta * slope
+        lam += delta
+
+    return loads, lam
+
+def slsqp_minimize(coefficients, total_sum, p_min=None, p_max=None, use_jac=True, x0=None):
+    coefficients = np.asarray(coefficients, dtype=float).reshape(-1, 3)
+    nod = len(coefficients)
+
+    p_min = [0.0] * nod if p_min is None else p_min
+    p_max = [None] * nod if p_max is None else [None if np.isinf(p) else p for p in p_max]
+
+    # A previous solution of the same fleet is a better start than all zeros
+    loads = np.array(x0, dtype=float) if x0 is not None and len(x0) == nod else np.zeros(nod)
+    cons = {'type': 'eq', 'fun': equality_constraint, 'args': (total_sum,)}
+    if use_jac:
+        cons['jac'] = equality_constraint_jac
+    bounds = list(zip(p_min, p_max))
+
+    # Without jac SLSQP falls back to finite differences, n + 1 objective calls per gradient
+    jac = objective_jac if use_jac else None
+    return minimize(objective, loads, args=(coefficients,), jac=jac, method='SLSQP', constraints=cons, bounds=bounds,
+                    options={'maxiter': max(100, 5 * nod)})
+
+def slsqp_dispatch(coefficients, total_sum, p_min=None, p_max=None, x0=None):
+    if len(coefficients) == 0:
+        return None
+
+    result = slsqp_minimize(coefficients, total_sum, p_min, p_max, x0=x0)
+    return result.x if result.success else None
+
+def compare_slsqp(coefficients, total_sum, p_min=None, p_max=None):
+    # Iteration and evaluation counts with finite differences vs the analytic gradient
+    rows = {}
+    for label, use_jac in (('Finite differences', False), ('Analytic jac', True)):
+        start = time.perf_counter()
+        result = slsqp_minimize(coefficients, total_sum, p_min, p_max, use_jac)
+        rows[label] = {
+            'success': result.success,
+            'iterations': result.nit,
+            'function evals': result.nfev,
+            'gradient evals': result.get('njev', 0),
+            'time (ms)': (time.perf_counter() - start) * 1000,
+            'cost': result.fun,
+        }
+    return rows
+
+def solve_dispatch(coefficients, total_sum, solver='Lambda iteration', p_min=None, p_max=None, warm_start=None):
+    # Lambda iteration only applies to convex quadratic costs, anything else goes to SLSQP.
+    # warm_start is the (loads, lambda) of an earlier call, used as the starting point
+    coefficients = np.asarray(coefficients, dtype=float).reshape(-1, 3)
+    quadratic = len(coefficients) > 0 and np.all(coefficients[:, 0] > 0)
+    x0, lam0 = warm_start if warm_start is not None else (None, None)
+
+    if solver == 'Lambda iteration' and quadratic:
+        try:
+            loads, lam = lambda_dispatch(coefficients, total_sum, p_min, p_max, lam0=lam0)
+        except ValueError:
+            return None, None
+        return loads, lam
+
+    return slsqp_dispatch(coefficients, total_sum, p_min, p_max, x0), None
+
+@lru_cache(maxsize=256)
+def solve_incremental_cost(coefficients, demand):
+    # Equal incremental cost 2*a_i*P_i + b_i = lambda for every load with sum(P) = demand,
+    # solved directly: lambda = (demand + sum(b / 2a)) / sum(1 / 2a). coefficients is a
+    # tuple of (a, b, c) rows so the page's unchanged inputs hit the cache across reruns
+    coeffs = np.array(coefficients, dtype=float).reshape(-1, 3)
+    a, b = coeffs[:, 0], coeffs[:, 1]
+    if len(a) == 0 or np.any(a == 0):
+        return None, None
+
+    inv = 1 / (2 * a)
+    ambda = (demand + np.sum(b * inv)) / np.sum(inv)
+    pi = (ambda - b) * inv
+    return pi, ambda
+
+@lru_cache(maxsize=64)
+def symbolic_model(coefficients):
+    # Cost equations and equal incremental cost conditions as sympy expressions, for display
+    import sympy as sp
+
+    pi, ambda = sp.symbols('pi ambda')
+    equations = [ai * pi**2 + bi * pi + ci for ai, bi, ci in coefficients]
+    differentials = [2 * ai * pi + bi - ambda for ai, bi, ci in coefficients]
+    return equations, differentials
+
+def transmission_loss(loads, B, B0, B00):
+    return loads @ B @ loads + B0 @ loads + B00
+
+def loss_dispatch(coefficients, total_sum, B, B0=None, B00=0.0, p_min=None, p_max=None, tol=1e-6, max_iter=100,
+                  warm_start=None):
+    coefficients = np.asarray(coefficients, dtype=float).reshape(-1, 3)
+    n = len(coefficients)
+    B = np.asarray(B, dtype=float).reshape(n, n)
+    B0 = np.zeros(n) if B0 is None else np.asarray(B0, dtype=float).reshape(n)
+
+    # warm_start is an earlier result of this function; its loads and lambda replace the lossless start
+    if warm_start is not None and len(warm_start.x) == n:
+        loads, lam = np.array(warm_start.x, dtype=float), warm_start.lam
+    else:
+        loads, lam = lambda_dispatch(coefficients, total_sum, p_min, p_max)
+    converged = False
+    for nit in range(1, max_iter + 1):
+        # Penalty factors from the incremental losses dPL/dPi = 2 * (B @ P)_i + B0_i
+        incremental = 2 * (B @ loads) + B0
+        if np.any(incremental >= 1):
+            break
+        penalty = 1 / (1 - incremental)
+
+        # pf_i * (2 * a_i * P_i + b_i) = lambda is a plain lambda dispatch with
+        # scaled a and b, for the demand plus the losses of the last iterate
+        scaled = coefficients * penalty[:, None]
+        demand = total_sum + transmission_loss(loads, B, B0, B00)
+        new_loads, lam = lambda_dispatch(scaled, demand, p_min, p_max, lam0=lam)
+
+        step = np.max(np.abs(new_loads - loads))
+        loads = new_loads
+        if step <= tol:
+            converged = True
+            break
+
+    return OptimizeResult(x=loads, lam=lam, losses=transmission_loss(loads, B, B0, B00), nit=nit, success=converged)
+
+def dispatch_curve(coefficients, p_min, p_max, max_demand):
+    a, b = coefficients[:, 0], coefficients[:, 1]
+    slope = 1 / (2 * a)
+
+    # Total output is piecewise linear in lambda; each unit adds its slope
+    # between the lambda where it leaves p_min and the one where it hits p_max.
+    # An unbounded unit gets a cap above every demand: at exactly the peak its
+    # curve would end in a flat stretch that interpolation resolves to the right
+    upper = np.where(np.isfinite(p_max), p_max, p_min + max_demand + 1)
+    events = np.concatenate((b + 2 * a * p_min, b + 2 * a * upper))
+    deltas = np.concatenate((slope, -slope))
+    order = np.argsort(events, kind='stable')
+    events, deltas = events[order], deltas[order]
+
+    active = np.cumsum(deltas)[:-1]
+    totals = p_min.sum() + np.concatenate(([0.0], np.cumsum(active * np.diff(events))))
+    return events, totals
+
+def batch_dispatch(coefficients, demands, p_min=None, p_max=None):
+    coefficients = np.asarray(coefficients, dtype=float).reshape(-1, 3)
+    demands = np.asarray(demands, dtype=float).ravel()
+    a, b = coefficients[:, 0], coefficients[:, 1]
+    n = len(a)
+    p_min = np.zeros(n) if p_min is None else np.broadcast_to(np.asarray(p_min, dtype=float), (n,))
+    p_max = np.full(n, np.inf) if p_max is None else np.broadcast_to(np.asarray(p_max, dtype=float), (n,))
+
+    if n == 0 or np.any(a <= 0):
+        raise ValueError("Batch dispatch needs strictly convex quadratic costs (a > 0)")
+
+    # One lambda-to-output curve serves every period, so each demand is a single interpolation
+    events, totals = dispatch_curve(coefficients, p_min, p_max, max(demands.max(initial=0.0), 0.0))
+    lam = np.interp(demands, totals, events)
+    lam[(demands < p_min.sum()) | (demands > p_max.sum())] = np.nan
+
+    loads = np.clip((lam[:, None] - b) / (2 * a), p_min, p_max)
+    return loads, lam
+
+def stream_dispatch(coefficients, source, out_path, column=None, chunksize=100000, p_min=None, p_max=None):
+    import pandas as pd
+
+    nod = len(coefficients)
+    periods = 0
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        demands = chunk[column] if column is not None else chunk.iloc[:, 0]
+        loads, lam = batch_dispatch(coefficients, demands.to_numpy(dtype=float), p_min, p_max)
+
+        out = pd.DataFrame(loads, columns=[f"P{i + 1}" for i in range(nod)])
+        out.insert(0, 'lambda', lam)
+        out.insert(0, 'demand', demands.to_numpy())
+        out.insert(0, 'period', np.arange(periods, periods + len(chunk)))
+        out.to_csv(out_path, mode='w' if periods == 0 else 'a', header=periods == 0, index=False)
+
+        periods += len(chunk)
+    return periods
+
+def build_horizon(coefficients, periods, p_min, p_max, ramp=None, startup_cost=None, segments=4):
+    coefficients = np.asarray(coefficients, dtype=float).reshape(-1, 3)
+    n, T, K = len(coefficients), int(periods), int(segments)
+    a, b, c = coefficients.T
+    p_min = np.broadcast_to(np.asarray(p_min, dtype=float), (n,))
+    p_max = np.broadcast_to(np.asarray(p_max, dtype=float), (n,))
+    ramp = np.full(n, np.inf) if ramp is None else np.broadcast_to(np.asarray(ramp, dtype=float), (n,))
+    startup_cost = np.zeros(n) if startup_cost is None else np.broadcast_to(np.asarray(startup_cost, dtype=float), (n,))
+
+    if not np.all(np.isfinite(p_max)):
+        raise ValueError("Multi-period dispatch needs finite generator maximums")
+
+    # Per period the variables are [u (n), v (n), segments (n * K)]: on/off state,
+    # startup indicator and the output of each linearized cost segment above p_min
+    m = n * (2 + K)
+    N = T * m
+    rows = np.arange(T * n)
+    base = (rows // n) * m
+    unit = rows % n
+    u_cols = base + unit
+    v_cols = base + n + unit
+    seg_cols = (base[:, None] + 2 * n + unit[:, None] * K + np.arange(K)).ravel()
+
+    U = sp.csr_matrix((np.ones(T * n), (rows, u_cols)), shape=(T * n, N))
+    V = sp.csr_matrix((np.ones(T * n), (rows, v_cols)), shape=(T * n, N))
+    Seg = sp.csr_matrix((np.ones(T * n * K), (np.arange(T * n * K), seg_cols)), shape=(T * n * K, N))
+
+    # P[t, i] = p_min_i * u[t, i] + sum_k seg[t, i, k]
+    width = (p_max - p_min) / K
+    Pop = sp.diags(np.tile(p_min, T)) @ U + sp.csr_matrix(
+        (np.ones(T * n * K), (np.repeat(rows, K), seg_cols)), shape=(T * n, N))
+
+    # Secant slopes of the quadratic cost over each segment (increasing, so they fill in order)
+    edges = p_min[:, None] + width[:, None] * np.arange(K + 1)
+    cost = (a[:, None] * edges + b[:, None]) * edges + c[:, None]
+    slopes = np.divide(np.diff(cost, axis=1), width[:, None], out=np.zeros((n, K)), where=width[:, None] > 0)
+
+    obj = np.zeros(N)
+    obj[u_cols] = np.tile(cost[:, 0], T)
+    obj[v_cols] = np.tile(startup_cost, T)
+    obj[seg_cols] = np.tile(slopes.ravel(), T)
+
+    # Ramp limits R between periods; a unit starting up or shutting down may
+    # jump by max(R, p_min) so that it can reach or leave its minimum output
+    limit = np.minimum(ramp, p_max)
+    jump = np.maximum(limit, p_min)
+    first, rest, prev = slice(0, n), slice(n, T * n), slice(0, T * n - n)
+    relax_first, relax_rest = sp.diags(jump - limit), sp.diags(np.tile(jump - limit, T - 1))
+    blocks = [
+        # Demand balance, one row per period
+        sp.kron(sp.identity(T), np.ones((1, n))) @ Pop,
+        # Segments only carry output when the unit is on
+        Seg - sp.diags(np.repeat(np.tile(width, T), K)) @ U[np.repeat(rows, K)],
+        # P[t] - P[t - 1] <= R * u[t - 1] + jump * (1 - u[t - 1]), and the mirror for ramping down
+        sp.vstack((Pop[first], Pop[rest] - Pop[prev] + relax_rest @ U[prev])),
+        sp.vstack((-Pop[first] + relax_first @ U[first], Pop[prev] - Pop[rest] + relax_rest @ U[rest])),
+        # Startup indicator v[t] >= u[t] - u[t - 1]
+        sp.vstack((U[first] - V[first], U[rest] - U[prev] - V[rest])),
+    ]
+
+    integrality = np.zeros(N)
+    integrality[u_cols] = 1
+    upper = np.ones(N)
+    upper[seg_cols] = np.repeat(np.tile(width, T), K)
+
+    return {
+        'n': n, 'periods': T, 'A': sp.vstack(blocks, format='csr'), 'c': obj,
+        'integrality': integrality, 'upper': upper, 'u_cols': u_cols,
+        'Pop': Pop, 'U': U, 'limit': limit, 'jump': jump,
+    }
+
+def solve_horizon(model, demands, initial=None, warm_start=None, time_limit=None, mip_rel_gap=1e-2):
+    n, T = model['n'], model['periods']
+    demands = np.asarray(demands, dtype=float).reshape(T)
+    limit, jump = model['limit'], model['jump']
+
+    # Row bounds follow the block order of build_horizon; only these change between solves
+    ramp_up = np.tile(jump, T)
+    ramp_dn = ramp_up.copy()
+    startup = np.zeros(T * n)
+    if initial is None:
+        ramp_up[:n] = ramp_dn[:n] = np.inf
+        startup[:n] = 1
+    else:
+        # initial = (outputs, on/off states) at the period before the horizon
+        p0, u0 = (np.asarray(v, dtype=float).reshape(n) for v in initial)
+        ramp_up[:n] = p0 + limit * u0 + jump * (1 - u0)
+        ramp_dn[:n] = jump - p0
+        startup[:n] = u0
+
+    rows = model['A'].shape[0]
+    lower = np.concatenate((demands, np.full(rows - T, -np.inf)))
+    upper = np.concatenate((demands, np.zeros(rows - T - 3 * T * n), ramp_up, ramp_dn, startup))
+
+    constraints = LinearConstraint(model['A'], lower, upper)
+    lb = np.zeros(len(model['c']))
+    options = {'mip_rel_gap': mip_rel_gap}
+    if time_limit is not None:
+        options['time_limit'] = time_limit
+
+    # HiGHS in SciPy takes no MIP start, so the previous commitment is used as an
+    # incumbent instead: redispatching it is a plain LP. It is returned as is only
+    # when the LP relaxation proves it within mip_rel_gap of the optimum, the same
+    # guarantee the MILP gives; otherwise the full commitment problem is solved
+    # and the incumbent only stands in when that stops without a better schedule
+    incumbent = None
+    if warm_start is not None and warm_start.commitment is not None and warm_start.commitment.shape == (T, n):
+        ub = model['upper'].copy()
+        fixed = lb.copy()
+        fixed[model['u_cols']] = ub[model['u_cols']] = warm_start.commitment.ravel()
+        incumbent = milp(model['c'], bounds=Bounds(fixed, ub), constraints=constraints, options=options)
+        if not incumbent.success:
+            incumbent = None
+
+    result = None
+    if incumbent is not None:
+        relaxed = milp(model['c'], bounds=Bounds(lb, model['upper']), constraints=constraints, options=options)
+        if relaxed.success and incumbent.fun - relaxed.fun <= mip_rel_gap * abs(incumbent.fun):
+            result = incumbent
+        else:
+            result = milp(model['c'], integrality=model['integrality'], bounds=Bounds(lb, model['upper']),
+                          constraints=constraints, options=options)
+            # A time limit can stop the search before it beats the incumbent
+            if result.x is None or result.fun > incumbent.fun:
+                result = incumbent
+
+    if result is None:
+        result = milp(model['c'], integrality=model['integrality'], bounds=Bounds(lb, model['upper']),
+                      constraints=constraints, options=options)
+
+    if result.x is None:
+        return OptimizeResult(x=None, commitment=None, fun=None, success=False, message=result.message)
+
+    loads = (model['Pop'] @ result.x).reshape(T, n)
+    commitment = np.round(model['U'] @ result.x).reshape(T, n)
+    return OptimizeResult(x=loads, commitment=commitment, fun=result.fun, success=result.success, message=result.message)
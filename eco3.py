@@ -1,12 +1,13 @@
 import streamlit as st
 import numpy as np
-from scipy.optimize import minimize
-
-def objective(loads, coefficients):
-    return sum(coefficients[i][0] * loads[i]**2 + coefficients[i][1] * loads[i] + coefficients[i][2] for i in range(len(loads)))
-
-def equality_constraint(loads, total_sum):
-    return np.sum(loads) - total_sum
+import pandas as pd
+import time
+from functools import partial
+from dispatch import compare_slsqp, solve_dispatch, loss_dispatch, stream_dispatch, build_horizon, solve_horizon
+import metrics
+import offload
+import session_files
+import stages
 
 def display_equations(coefficients):
     st.subheader("Equations:")
@@ -15,7 +16,118 @@ def display_equations(coefficients):
         st.write(f"Equation {i + 1}: {a} * P{i + 1}^2 + {b} * P{i + 1} + {c}")
         st.write(f"Differential Equation {i + 1}:  {2*a} * P{i + 1} + {b} ")
 
+def batch_path():
+    # Every dispatch of the session rewrites the same file
+    if 'batch_file' not in st.session_state:
+        st.session_state['batch_file'] = session_files.SessionFile('.csv')
+    return st.session_state['batch_file'].path
+
+def batch_section(coefficients, p_min, p_max):
+    st.subheader("Batch Dispatch:")
+    uploaded = st.file_uploader("Upload hourly demand (CSV, first column or named column)", type='csv')
+    column = st.text_input("Demand column (blank for the first column)") or None
+    if uploaded is None:
+        return
+
+    # Only a new upload, column or fleet dispatches the file again; the results go to one file per session
+    key = (uploaded.file_id, column, coefficients.tobytes(), tuple(p_min), tuple(p_max))
+    out_path = batch_path()
+    if st.session_state.get('batch_key') != key:
+        try:
+            uploaded.seek(0)
+            start = time.perf_counter()
+            with metrics.stage('compute'):
+                periods = stream_dispatch(coefficients, uploaded, out_path, column, p_min=p_min, p_max=p_max)
+            st.session_state['batch_summary'] = (periods, time.perf_counter() - start)
+        except (ValueError, KeyError) as exc:
+            st.session_state['batch_summary'] = exc
+        st.session_state['batch_key'] = key
+
+    summary = st.session_state['batch_summary']
+    if isinstance(summary, Exception):
+        st.write(f"Batch dispatch failed: {summary}")
+        return
+    periods, elapsed = summary
+    st.write(f"Dispatched {periods} periods in {elapsed * 1000:.1f} ms")
+    with open(out_path, 'rb') as results:
+        st.download_button("Download dispatch results", results, file_name='dispatch.csv')
+
+def loss_section(graph, coefficients, total_sum, p_min, p_max):
+    nod = len(coefficients)
+    names = [f"P{i + 1}" for i in range(nod)]
+
+    st.subheader("Loss Coefficients:")
+    B = st.data_editor(pd.DataFrame(np.zeros((nod, nod)), index=names, columns=names), key='B')
+    B0 = st.data_editor(pd.DataFrame(np.zeros((1, nod)), index=['B0'], columns=names), key='B0')
+    B00 = st.number_input("B00", value=0.0, format="%.6f")
+    tol = st.number_input("Convergence tolerance (MW)", min_value=1e-12, value=1e-6, format="%.1e")
+    max_iter = st.number_input("Maximum iterations", min_value=1, step=1, value=100)
+
+    try:
+        # Starts from the previous solution, so editing one coefficient converges in a few iterations
+        with metrics.stage('compute'):
+            result = graph.run('loss', partial(loss_dispatch, warm_start=graph.previous('loss')), coefficients, total_sum,
+                               B.to_numpy(dtype=float), B0.to_numpy(dtype=float).ravel(), B00, p_min, p_max, tol=tol,
+                               max_iter=int(max_iter))
+    except ValueError as exc:
+        st.write(f"Solution not found: {exc}")
+        return
+
+    st.subheader("Solution:")
+    for i, load in enumerate(result.x):
+        st.write(f"P{i + 1}: {load}")
+    st.write(f"Lambda: {result.lam}")
+    st.write(f"Transmission losses: {result.losses}")
+    st.write(f"{'Converged' if result.success else 'Did not converge'} after {result.nit} iterations")
+
+def horizon_section(coefficients, total_sum, p_min, p_max):
+    nod = len(coefficients)
+    names = [f"P{i + 1}" for i in range(nod)]
+
+    st.subheader("Horizon:")
+    if nod == 0:
+        st.write("Add at least one generator to schedule a horizon")
+        return
+    periods = st.number_input("Number of periods", min_value=1, step=1, value=24)
+    demand = st.data_editor(pd.DataFrame({'demand': np.full(int(periods), float(total_sum))}), key=f'demand_{periods}')
+    units = st.data_editor(pd.DataFrame({'ramp': np.full(nod, np.inf), 'startup cost': np.zeros(nod)}, index=names), key='units')
+    segments = st.number_input("Cost segments per generator", min_value=1, step=1, value=4)
+    warm = st.checkbox("Warm start from the previous commitment", value=True,
+                       help="Kept only when it is within the solver's optimality gap, otherwise the commitment is re-solved")
+
+    ramp = units['ramp'].to_numpy(dtype=float)
+    startup_cost = units['startup cost'].to_numpy(dtype=float)
+    key = (coefficients.tobytes(), int(periods), tuple(p_min), tuple(p_max), ramp.tobytes(), startup_cost.tobytes(), int(segments))
+
+    try:
+        # The sparse model only depends on the fleet, so demand edits reuse it
+        if st.session_state.get('horizon_key') != key:
+            with metrics.stage('compute'):
+                st.session_state['horizon_model'] = build_horizon(coefficients, periods, p_min, p_max, ramp, startup_cost, segments)
+            st.session_state['horizon_key'] = key
+            st.session_state.pop('horizon_result', None)
+    except ValueError as exc:
+        st.write(f"Solution not found: {exc}")
+        return
+
+    previous = st.session_state.get('horizon_result') if warm else None
+    start = time.perf_counter()
+    with metrics.stage('compute'):
+        result = solve_horizon(st.session_state['horizon_model'], demand['demand'].to_numpy(dtype=float), warm_start=previous)
+    elapsed = time.perf_counter() - start
+
+    st.subheader("Solution:")
+    if result.x is None:
+        st.write(f"Solution not found: {result.message}")
+        return
+
+    st.session_state['horizon_result'] = result
+    st.write(f"Total cost: {result.fun:.2f} ({elapsed * 1000:.1f} ms)")
+    st.dataframe(pd.DataFrame(result.x, columns=names).rename_axis('period'))
+    st.dataframe(pd.DataFrame(result.commitment.astype(int), columns=names).rename_axis('period'))
+
 def main():
+    graph = stages.session_graph(st.session_state)
     st.title("Economic Load Dispatch")
 
     nod = st.number_input("Enter the number of generators:")
@@ -23,9 +135,14 @@ def main():
 
     nod = int(nod)
 
+    solver = st.radio("Solver", ['Lambda iteration', 'SLSQP', 'Batch (time series)', 'Loss-aware (B-coefficients)',
+                                'Multi-period (ramp + commitment)'])
+    use_limits = st.checkbox("Apply generator limits")
+
     # Define variables
-    loads = [0.0] * nod
     coefficients = []
+    p_min = [0.0] * nod
+    p_max = [np.inf] * nod
 
     for i in range(nod):
         st.subheader(f"Load {i + 1}")
@@ -33,27 +150,68 @@ def main():
         bi = st.number_input(f"Enter variable coefficient two for Load {i + 1}: ")
         ci = st.number_input(f"Enter variable coefficient three for Load {i + 1}: ")
         coefficients.append((ai, bi, ci))
+        if use_limits:
+            p_min[i] = st.number_input(f"Minimum output for Load {i + 1}: ", min_value=0.0)
+            p_max[i] = st.number_input(f"Maximum output for Load {i + 1}: ", min_value=0.0, value=float(total_sum))
+
+    coefficients = np.array(coefficients, dtype=float).reshape(-1, 3)
 
     # Display equations
     display_equations(coefficients)
 
-    # Set up the optimization problem
-    cons = ({'type': 'eq', 'fun': lambda loads: equality_constraint(loads, total_sum)})
-    bounds = [(0, None) for _ in range(nod)]
+    if solver == 'Batch (time series)':
+        batch_section(coefficients, p_min, p_max)
+        return
+    if solver == 'Loss-aware (B-coefficients)':
+        loss_section(graph, coefficients, total_sum, p_min, p_max)
+        return
+    if solver == 'Multi-period (ramp + commitment)':
+        horizon_section(coefficients, total_sum, p_min, p_max)
+        return
 
-    # Solve the optimization problem
-    result = minimize(objective, loads, args=(coefficients,), method='SLSQP', constraints=cons, bounds=bounds)
+    # Solve the optimization problem, warm-started from the last solution and lambda
+    solve = partial(solve_dispatch, warm_start=graph.previous('dispatch'))
+    if solver == 'SLSQP':
+        # SLSQP on a large fleet takes seconds, so it runs in the shared process pool
+        solve = partial(offload.run_in_page, solve, label='Solving')
+    try:
+        with metrics.stage('compute'):
+            loads, lam = graph.run('dispatch', solve, coefficients, total_sum, solver, p_min, p_max)
+    except offload.JOB_ERRORS as exc:
+        st.write(f"Solution not found: {exc}")
+        return
 
     # Display the solution
     st.subheader("Solution:")
-    if result.success:
-        for i, load in enumerate(result.x):
+    if loads is not None:
+        for i, load in enumerate(loads):
             st.write(f"P{i + 1}: {load}")
+        if lam is not None:
+            st.write(f"Lambda: {lam}")
     else:
         st.write("Solution not found")
 
+    if solver == 'SLSQP' and nod > 0 and st.checkbox("Compare finite-difference and analytic gradients"):
+        try:
+            with metrics.stage('compute'):
+                comparison = graph.run('compare', partial(offload.run_in_page, compare_slsqp, label='Comparing'),
+                                       coefficients, total_sum, p_min, p_max)
+        except offload.JOB_ERRORS as exc:
+            st.write(f"Comparison not run: {exc}")
+            return
+        # One row per method, so each column keeps a single type for Arrow
+        table = pd.DataFrame(comparison).T.infer_objects()
+        table['success'] = table['success'].astype(str)
+        st.table(table)
+        fd, exact = comparison['Finite differences'], comparison['Analytic jac']
+        st.write(f"Function evaluations: {fd['function evals']} -> {exact['function evals']}, "
+                 f"iterations: {fd['iterations']} -> {exact['iterations']}")
+
 if __name__ == '__main__':
-    main()
+    with metrics.rerun('eco3'):
+        main()
+    st.sidebar.caption(stages.session_report(st.session_state))
+    metrics.panel()
 
 # Copyright text at the bottom
 st.markdown(
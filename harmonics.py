@@ -0,0 +1,60 @@
+import numpy as np
+import core
+import mna
+
+# Steady state of linear circuits under distorted sources. Every harmonic order
+# is its own phasor problem at h * f0, so all orders are solved in one pass:
+# series chains broadcast the impedance over the order axis and netlists go
+# through mna.solve_netlist_batch with one angular frequency per row. Results
+# keep the order on the last axis, the layout core.distorted_power_triangle
+# expects.
+
+MAX_ORDER = 50
+
+def harmonic_spectrum(orders, magnitudes, phases=0.0, max_order=MAX_ORDER):
+    # Relative phasors for orders 1..max_order; magnitudes are fractions of the
+    # fundamental, phases in degrees, and the fundamental itself is always 1
+    orders = np.asarray(orders, dtype=int)
+    magnitudes = np.broadcast_to(np.asarray(magnitudes, dtype=float), orders.shape)
+    phases = np.broadcast_to(np.asarray(phases, dtype=float), orders.shape)
+    keep = (orders >= 2) & (orders <= max_order)
+
+    spectrum = np.zeros(max_order, dtype=complex)
+    spectrum[0] = 1
+    spectrum[orders[keep] - 1] = magnitudes[keep] * np.exp(1j * np.radians(phases[keep]))
+    return spectrum
+
+def series_harmonics(components, voltage, f0, spectrum):
+    # A source of `voltage` RMS at the fundamental, distorted by spectrum, across the series chain
+    orders = np.arange(1, len(spectrum) + 1)
+    V = voltage * np.asarray(spectrum, dtype=complex)
+    Z = np.broadcast_to(core.series_impedance(components, orders * f0), V.shape)
+    return {'orders': orders, 'Z': Z, 'V': V, 'I': V / Z}
+
+def netlist_harmonics(netlist, f0, spectrum, distorted=None):
+    # Sources named in distorted (all of them by default) carry the spectrum, the
+    # others only the fundamental. Voltages and currents are (elements, orders):
+    # the drop from the first node to the second and the current in that direction
+    spectrum = np.asarray(spectrum, dtype=complex)
+    orders = np.arange(1, len(spectrum) + 1)
+    values = np.array([comp['value'] for comp in netlist], dtype=float)
+    source = np.array([comp['type'] in mna.SOURCES for comp in netlist])
+    if distorted is not None:
+        source_spectrum = source & np.isin([comp.get('name') for comp in netlist], list(distorted))
+    else:
+        source_spectrum = source
+
+    scale = np.where(source_spectrum, spectrum[:, None], (orders == 1)[:, None])
+    result = mna.solve_netlist_batch(netlist, np.tile(values, (len(orders), 1)), 2 * np.pi * f0 * orders,
+                                     sources=values * scale)
+
+    # Ground is the index one past the last node in the pattern, so pad the node voltages out to it
+    pattern = mna.build_pattern(mna.netlist_topology(netlist))
+    padded = np.zeros((len(orders), pattern['size'] + 1), dtype=complex)
+    padded[:, :pattern['nodes']] = result['voltages']
+    drops = padded[:, pattern['n1']] - padded[:, pattern['n2']]
+
+    return {
+        'orders': orders, 'node_names': result['node_names'], 'branch_names': result['branch_names'],
+        'node_voltages': result['voltages'].T, 'voltages': drops.T, 'currents': result['currents'].T,
+    }
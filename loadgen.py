@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+# Load generator for service.py: keep-alive connections each send requests
+# back to back, and client-side latency percentiles and throughput are reported
+# per endpoint, followed by the server's own /stats (batch sizes, cache hits).
+
+FLEET = [[0.004, 5.3, 500], [0.006, 5.5, 400], [0.009, 5.8, 200]]
+
+def make_payload(endpoint, rng, unique):
+    # With unique=False values are drawn from small integer grids, so repeats hit the cache
+    draw = (lambda low, high: float(rng.uniform(low, high))) if unique else (lambda low, high: int(rng.integers(low, high)))
+    if endpoint == '/triangle':
+        return {'voltage': draw(0, 250), 'current': draw(0, 50), 'phase': draw(0, 90)}
+    if endpoint == '/impedance':
+        return {'components': [{'type': 'Resistor', 'value': 10}, {'type': 'Inductor', 'value': 0.05},
+                               {'type': 'Capacitor', 'value': 1e-4}], 'freq': draw(1, 1000), 'voltage': 10}
+    return {'coefficients': FLEET, 'demand': draw(100, 1500), 'p_min': [50, 50, 50], 'p_max': [600, 500, 400]}
+
+async def request(reader, writer, method, path, payload=None):
+    body = b'' if payload is None else json.dumps(payload).encode()
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+async def client(host, port, endpoints, count, rng, unique, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            endpoint = endpoints[rng.integers(len(endpoints))]
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, 'POST', endpoint, make_payload(endpoint, rng, unique))
+            latencies[endpoint].append(time.perf_counter() - start)
+            if status != 200:
+                errors[endpoint] += 1
+    finally:
+        writer.close()
+
+async def run(args):
+    endpoints = [f'/{name}' for name in args.endpoints.split(',')]
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = dict.fromkeys(endpoints, 0)
+    per_client = args.requests // args.concurrency
+    seeds = np.random.SeedSequence(args.seed).spawn(args.concurrency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(args.host, args.port, endpoints, per_client, np.random.default_rng(seed),
+                                  args.unique, latencies, errors) for seed in seeds))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{'endpoint':<12} {'requests':>9} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for endpoint, values in latencies.items():
+        values = np.array(values) * 1000
+        if len(values):
+            print(f'{endpoint:<12} {len(values):>9} {errors[endpoint]:>7} '
+                  f'{np.percentile(values, 50):8.2f} {np.percentile(values, 99):8.2f}')
+    print(f'{total} requests in {elapsed:.2f} s: {total / elapsed:,.0f} requests/s at concurrency {args.concurrency}')
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, stats = await request(reader, writer, 'GET', '/stats')
+    writer.close()
+    print(f"server: cache {stats['cache']['hits']} hits / {stats['cache']['misses']} misses")
+    for path, route in stats['routes'].items():
+        if route['requests']:
+            print(f"server {path:<12} batches {route['batches']:>6}, mean batch {route['mean_batch']:6.1f}, "
+                  f"p50 {route['p50_ms']:.2f} ms, p99 {route['p99_ms']:.2f} ms")
+
+async def wait_for_port(host, port, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the JSON compute service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--endpoints', default='triangle,impedance,dispatch')
+    parser.add_argument('--unique', action='store_true', help='random float inputs, so the cache rarely hits')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spawn', action='store_true', help='start service.py for the duration of the run')
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service.py'),
+                                   '--host', args.host, '--port', str(args.port)], stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_for_port(args.host, args.port))
+        asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+# Per-rerun stage timings for the Streamlit pages. A page wraps its main() in
+# rerun(app) and the interesting parts in stage(name); the time not covered by
+# any stage is recorded as 'widgets', which is mostly widget construction.
+#
+# Off unless APP_METRICS=1 (or enable() is called): stage() and rerun() then
+# hand back one shared no-op context manager. When on, the last WINDOW samples
+# of every (app, stage) are kept in process, fixed-bucket counters back the
+# Prometheus export, and APP_METRICS_FILE (*.prom for Prometheus text, anything
+# else for JSON lines) is written after every rerun.
+
+WINDOW = 1000
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ENABLED = os.environ.get('APP_METRICS', '') not in ('', '0')
+EXPORT_PATH = os.environ.get('APP_METRICS_FILE')
+
+NULL_STAGE = nullcontext()
+
+lock = threading.Lock()
+samples = defaultdict(lambda: deque(maxlen=WINDOW))
+buckets = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+totals = defaultdict(float)
+gauges = {}
+
+current = threading.local()
+
+def enable(export_path=None):
+    global ENABLED, EXPORT_PATH
+    ENABLED = True
+    EXPORT_PATH = export_path or EXPORT_PATH
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def record(app, name, seconds):
+    key = (app, name)
+    index = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+    with lock:
+        samples[key].append(seconds)
+        buckets[key][index] += 1
+        totals[key] += seconds
+
+def register_gauge(name, read):
+    # read() is called at export time, so the value is never stale
+    gauges[name] = read
+
+def stage(name):
+    if not ENABLED or getattr(current, 'app', None) is None:
+        return NULL_STAGE
+    return timed_stage(name)
+
+@contextmanager
+def timed_stage(name):
+    # Only outermost stages count towards the time taken out of 'widgets'
+    current.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        current.depth -= 1
+        current.stages[name] = current.stages.get(name, 0.0) + elapsed
+        if current.depth == 0:
+            current.covered += elapsed
+
+def rerun(app):
+    if not ENABLED:
+        return NULL_STAGE
+    return timed_rerun(app)
+
+@contextmanager
+def timed_rerun(app):
+    current.app, current.stages, current.depth, current.covered = app, {}, 0, 0.0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stages = dict(current.stages, widgets=max(elapsed - current.covered, 0.0), rerun=elapsed)
+        current.app = None
+        for name, seconds in stages.items():
+            record(app, name, seconds)
+        if EXPORT_PATH:
+            export(EXPORT_PATH, app, stages)
+
+def summary():
+    # One row per (app, stage) with percentiles over the rolling window, in milliseconds
+    with lock:
+        snapshot = {key: sorted(values) for key, values in samples.items()}
+    rows = []
+    for (app, name), values in sorted(snapshot.items()):
+        pick = lambda q: values[min(int(q * len(values)), len(values) - 1)] * 1000
+        rows.append({'app': app, 'stage': name, 'count': len(values), 'p50 (ms)': pick(0.5), 'p95 (ms)': pick(0.95),
+                     'max (ms)': values[-1] * 1000})
+    return rows
+
+def prometheus_text():
+    lines = ['# HELP app_stage_seconds Time spent in each stage of a page rerun',
+             '# TYPE app_stage_seconds histogram']
+    with lock:
+        items = sorted((key, list(counts), totals[key]) for key, counts in buckets.items())
+    for (app, name), counts, total in items:
+        labels = f'app="{app}",stage="{name}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'app_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f'app_stage_seconds_sum{{{labels}}} {total}')
+        lines.append(f'app_stage_seconds_count{{{labels}}} {cumulative}')
+    for name, read in sorted(gauges.items()):
+        lines += [f'# TYPE app_{name} gauge', f'app_{name} {read()}']
+    return '\n'.join(lines) + '\n'
+
+def export(path, app, stages):
+    if path.endswith('.prom'):
+        # Rewritten in place atomically, so a scraper never reads half a file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.prom')
+        with os.fdopen(fd, 'w') as out:
+            out.write(prometheus_text())
+        os.replace(tmp, path)
+    else:
+        with lock, open(path, 'a') as out:
+            out.write(json.dumps({'time': time.time(), 'app': app, 'seconds': stages}) + '\n')
+
+def panel():
+    # Sidebar table of the rolling timings; drawn only while metrics are on
+    if not ENABLED:
+        return
+    import streamlit as st
+
+    with st.sidebar.expander('Stage timings'):
+        st.dataframe(summary(), hide_index=True)
+        if gauges:
+            st.caption(', '.join(f'{name}: {read()}' for name, read in sorted(gauges.items())))
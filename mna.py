@@ -0,0 +1,216 @@
+import re
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import splu
+from functools import lru_cache
+
+PASSIVE = ('Resistor', 'Inductor', 'Capacitor')
+SOURCES = ('VoltageSource', 'CurrentSource')
+
+SPICE_TYPES = {'R': 'Resistor', 'L': 'Inductor', 'C': 'Capacitor', 'V': 'VoltageSource', 'I': 'CurrentSource'}
+SPICE_SCALE = {'t': 1e12, 'g': 1e9, 'meg': 1e6, 'k': 1e3, 'm': 1e-3, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12, 'f': 1e-15}
+SPICE_NUMBER = re.compile(r'^([+-]?(?:\d+\.?\d*|\.\d+)(?:e[+-]?\d+)?)(meg|[tgkmunpf])?[a-z]*$', re.IGNORECASE)
+
+def spice_value(token):
+    match = SPICE_NUMBER.match(token)
+    if match is None:
+        raise ValueError(f"Not a SPICE number: {token}")
+    number, scale = match.groups()
+    return float(number) * SPICE_SCALE.get((scale or '').lower(), 1.0)
+
+def parse_spice_card(card, lineno):
+    tokens = card.split()
+    compType = SPICE_TYPES.get(tokens[0][0].upper())
+    if compType is None or len(tokens) < 4:
+        raise ValueError(f"Line {lineno}: unsupported element '{card}'")
+
+    values = tokens[3:]
+    if compType in SOURCES:
+        # Sources may read "V1 1 0 10", "V1 1 0 DC 10" or "V1 1 0 AC 10 0"; AC wins over DC
+        upper = [token.upper() for token in values]
+        for keyword in ('AC', 'DC'):
+            if keyword in upper and upper.index(keyword) + 1 < len(values):
+                values = values[upper.index(keyword) + 1:]
+                break
+
+    try:
+        compVal = spice_value(values[0])
+    except ValueError:
+        raise ValueError(f"Line {lineno}: bad value in '{card}'")
+    return {'name': tokens[0], 'type': compType, 'nodes': (tokens[1], tokens[2]), 'value': compVal}
+
+def parse_spice(lines):
+    # Streams components out of a SPICE netlist; like SPICE, the first line is the title.
+    # Supports R, L, C, V and I cards, '+' continuations, '*' and ';' comments and .end
+    card, start = None, 0
+    for lineno, raw in enumerate(lines, start=1):
+        line = (raw.decode() if isinstance(raw, bytes) else raw).split(';')[0].strip()
+        if lineno == 1 or not line or line.startswith('*'):
+            continue
+        if line.startswith('+') and card is not None:
+            card += ' ' + line[1:]
+            continue
+        if card is not None:
+            yield parse_spice_card(card, start)
+            card = None
+        if line.lower().startswith('.end') and not line.lower().startswith('.ends'):
+            return
+        if line.startswith('.'):
+            continue
+        card, start = line, lineno
+    if card is not None:
+        yield parse_spice_card(card, start)
+
+def element_admittance(compType, compVal, omega):
+    compVal = np.asarray(compVal, dtype=float)
+    if compType == 'Resistor':
+        return 1 / compVal + 0j
+    if compType == 'Inductor':
+        return 1 / (1j * omega * compVal)
+    if compType == 'Capacitor':
+        return 1j * omega * compVal
+    raise ValueError(f"Unknown passive component type: {compType}")
+
+@lru_cache(maxsize=32)
+def build_pattern(topology):
+    # topology is a tuple of (type, node1, node2); node '0' is ground
+    types = np.array([compType for compType, _, _ in topology], dtype=object)
+    unknown = set(types) - set(PASSIVE) - set(SOURCES)
+    if unknown:
+        raise ValueError(f"Unknown component type: {unknown.pop()}")
+
+    names = sorted({node for _, n1, n2 in topology for node in (n1, n2)} - {'0'})
+    index = {name: i for i, name in enumerate(names)}
+    nodes = len(names)
+    passive = np.isin(types, PASSIVE)
+    vsource = types == 'VoltageSource'
+    isource = types == 'CurrentSource'
+    size = nodes + int(vsource.sum())
+
+    # Ground maps to the index one past the last unknown so it can be dropped or padded
+    n1 = np.array([index.get(node, size) for _, node, _ in topology], dtype=int)
+    n2 = np.array([index.get(node, size) for _, _, node in topology], dtype=int)
+    branch = np.full(len(topology), size)
+    branch[vsource] = nodes + np.arange(vsource.sum())
+
+    # Stamps as (row, col, element, sign); a voltage source k adds row/column nodes + k
+    p, v = np.flatnonzero(passive), np.flatnonzero(vsource)
+    rows = np.concatenate((n1[p], n2[p], n1[p], n2[p], n1[v], n2[v], branch[v], branch[v]))
+    cols = np.concatenate((n1[p], n2[p], n2[p], n1[p], branch[v], branch[v], n1[v], n2[v]))
+    elems = np.concatenate((p, p, p, p, v, v, v, v))
+    signs = np.concatenate((np.ones(2 * len(p)), -np.ones(2 * len(p)), [1.0] * len(v), [-1.0] * len(v),
+                            [1.0] * len(v), [-1.0] * len(v)))
+    keep = (rows != size) & (cols != size)
+    rows, cols, elems, signs = rows[keep], cols[keep], elems[keep], signs[keep]
+
+    # Map every stamp onto its slot in the CSC data array once, so refilling the
+    # matrix for new component values is a single bincount over the stamps
+    unique, slot = np.unique(cols * size + rows, return_inverse=True)
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(unique // size, minlength=size))))
+
+    return {
+        'node_names': names, 'nodes': nodes, 'size': size,
+        'n1': n1, 'n2': n2, 'passive': passive, 'vsource': vsource, 'isource': isource, 'branch': branch,
+        'indices': unique % size, 'indptr': indptr, 'slot': slot.ravel(), 'elems': elems, 'signs': signs,
+        'perm_c': None,
+    }
+
+def netlist_topology(netlist):
+    return tuple((comp['type'], str(comp['nodes'][0]), str(comp['nodes'][1])) for comp in netlist)
+
+def solve_netlist(netlist, omega=2 * np.pi):
+    pattern = build_pattern(netlist_topology(netlist))
+    size, nodes = pattern['size'], pattern['nodes']
+    types = np.array([comp['type'] for comp in netlist], dtype=object)
+    compVals = np.array([comp['value'] for comp in netlist], dtype=float)
+
+    # Stamp value per element: admittance for passives, 1 for voltage source incidence
+    values = np.ones(len(netlist), dtype=complex)
+    for compType in PASSIVE:
+        mask = types == compType
+        values[mask] = element_admittance(compType, compVals[mask], omega)
+
+    weights = pattern['signs'] * values[pattern['elems']]
+    count = len(pattern['indices'])
+    data = np.bincount(pattern['slot'], weights.real, count) + 1j * np.bincount(pattern['slot'], weights.imag, count)
+    Y = sp.csc_matrix((data, pattern['indices'], pattern['indptr']), shape=(size, size))
+
+    # Right-hand side: source voltages on the branch rows, current sources
+    # push their current from the first node into the second
+    rhs = np.zeros(size + 1, dtype=complex)
+    vsource, isource = pattern['vsource'], pattern['isource']
+    rhs[pattern['branch'][vsource]] = compVals[vsource]
+    np.add.at(rhs, pattern['n1'][isource], -compVals[isource])
+    np.add.at(rhs, pattern['n2'][isource], compVals[isource])
+    rhs = rhs[:size]
+
+    # Reuse the column ordering found by the first factorization of this topology;
+    # only the numeric factorization is repeated when component values change
+    if pattern['perm_c'] is None:
+        lu = splu(Y)
+        pattern['perm_c'] = lu.perm_c
+        x = lu.solve(rhs)
+    else:
+        order = np.argsort(pattern['perm_c'])
+        lu = splu(Y[:, order], permc_spec='NATURAL')
+        x = np.empty(size, dtype=complex)
+        x[order] = lu.solve(rhs)
+
+    voltages = x[:nodes]
+    padded = np.append(x, 0)
+
+    currents = np.where(pattern['passive'], values * (padded[pattern['n1']] - padded[pattern['n2']]), compVals + 0j)
+    currents[vsource] = x[pattern['branch'][vsource]]
+
+    return {
+        'node_names': pattern['node_names'], 'voltages': voltages,
+        'branch_names': [comp.get('name', f"{comp['type']} {k + 1}") for k, comp in enumerate(netlist)],
+        'currents': currents,
+    }
+
+def solve_netlist_batch(netlist, compVals, omega=2 * np.pi, sources=None):
+    # compVals is (samples, elements): one row of component values per sample over a
+    # fixed topology. Circuits are small, so every sample is a dense matrix and the
+    # whole block is a single batched np.linalg.solve. omega is one angular frequency
+    # or one per sample; sources optionally replaces the source values of compVals
+    # with complex phasors of the same shape
+    pattern = build_pattern(netlist_topology(netlist))
+    size, nodes = pattern['size'], pattern['nodes']
+    types = np.array([comp['type'] for comp in netlist], dtype=object)
+    compVals = np.atleast_2d(np.asarray(compVals, dtype=float))
+    samples = len(compVals)
+    omega = np.asarray(omega, dtype=float)
+    omega = omega[:, None] if omega.ndim == 1 else omega
+    sources = compVals + 0j if sources is None else np.broadcast_to(np.asarray(sources, dtype=complex), compVals.shape)
+
+    values = np.ones(compVals.shape, dtype=complex)
+    for compType in PASSIVE:
+        mask = types == compType
+        values[:, mask] = element_admittance(compType, compVals[:, mask], omega)
+
+    # Dense (row, col) of every stamp, recovered from its CSC slot
+    cols = np.repeat(np.arange(size), np.diff(pattern['indptr']))[pattern['slot']]
+    rows = pattern['indices'][pattern['slot']]
+    weights = pattern['signs'] * values[:, pattern['elems']]
+    flat = (np.arange(samples)[:, None] * size * size + rows * size + cols).ravel()
+    Y = (np.bincount(flat, weights.real.ravel(), samples * size * size)
+         + 1j * np.bincount(flat, weights.imag.ravel(), samples * size * size)).reshape(samples, size, size)
+
+    rhs = np.zeros((samples, size + 1), dtype=complex)
+    vsource, isource = pattern['vsource'], pattern['isource']
+    rhs[:, pattern['branch'][vsource]] = sources[:, vsource]
+    for k in np.flatnonzero(isource):
+        rhs[:, pattern['n1'][k]] -= sources[:, k]
+        rhs[:, pattern['n2'][k]] += sources[:, k]
+
+    x = np.linalg.solve(Y, rhs[:, :size, None])[..., 0]
+    padded = np.concatenate((x, np.zeros((samples, 1))), axis=1)
+
+    currents = np.where(pattern['passive'], values * (padded[:, pattern['n1']] - padded[:, pattern['n2']]), sources)
+    currents[:, vsource] = x[:, pattern['branch'][vsource]]
+
+    return {
+        'node_names': pattern['node_names'], 'voltages': x[:, :nodes],
+        'branch_names': [comp.get('name', f"{comp['type']} {k + 1}") for k, comp in enumerate(netlist)],
+        'currents': currents,
+    }
@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+
+# One process pool shared by every session of the server, for the solves and
+# drawings that would otherwise hold a session's script thread (and the GIL)
+# for seconds. At most MAX_JOBS jobs are queued or running at once; a job waits
+# for a slot within its own timeout. A job submitted under a key cancels the
+# earlier job of that key if it has not started yet, and a job that times out
+# or whose rerun is stopped is cancelled the same way. A job that is already
+# running cannot be interrupted: its result is dropped and it keeps its slot
+# until it finishes, so runaway jobs still count against the bound.
+#
+# Offloaded functions must live in a module without Streamlit code (dispatch,
+# schematic, ...): workers import them by reference. Workers are spawned with a
+# blank __main__, since Streamlit installs the running page script there and a
+# spawned worker would otherwise execute the whole page on startup.
+
+WORKERS = int(os.environ.get('APP_POOL_WORKERS', max(1, min(4, (os.cpu_count() or 2) - 1))))
+MAX_JOBS = int(os.environ.get('APP_POOL_JOBS', 4 * WORKERS))
+DEFAULT_TIMEOUT = 30.0
+POLL = 0.1
+
+# What page callers catch: the timeout, a job replaced by a newer one of the same key and a worker that died
+JOB_ERRORS = (TimeoutError, CancelledError, BrokenProcessPool)
+
+lock = threading.Lock()
+main_lock = threading.Lock()
+slots = threading.BoundedSemaphore(MAX_JOBS)
+pool = None
+pending = set()
+latest = {}
+counts = {'submitted': 0, 'completed': 0, 'cancelled': 0, 'timed_out': 0, 'rejected': 0}
+
+def job_name(func):
+    # functools.partial objects name the function they wrap
+    return getattr(getattr(func, 'func', func), '__name__', 'job')
+
+def get_pool():
+    # Workers are spawned rather than forked: forking the multi-threaded server is not safe
+    global pool
+    with lock:
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return pool
+
+def spawn_submit(executor, func, *args, **kwargs):
+    # The executor starts its workers inside submit(), and spawn copies sys.modules['__main__'] into them.
+    # Streamlit may install the next page script meanwhile, so __main__ is only restored if it is still the stub
+    with main_lock:
+        main = sys.modules['__main__']
+        stub = sys.modules['__main__'] = types.ModuleType('__main__')
+        try:
+            return executor.submit(func, *args, **kwargs)
+        finally:
+            if sys.modules['__main__'] is stub:
+                sys.modules['__main__'] = main
+
+def reset_pool(broken):
+    global pool
+    with lock:
+        if pool is broken:
+            pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def finished(future, key):
+    slots.release()
+    with lock:
+        pending.discard(future)
+        if latest.get(key) is future:
+            del latest[key]
+        counts['cancelled' if future.cancelled() else 'completed'] += 1
+
+def submit(func, *args, timeout=DEFAULT_TIMEOUT, key=None, **kwargs):
+    if not slots.acquire(timeout=timeout):
+        with lock:
+            counts['rejected'] += 1
+        raise TimeoutError(f"The worker pool is busy ({MAX_JOBS} jobs in flight)")
+
+    executor = get_pool()
+    try:
+        future = spawn_submit(executor, func, *args, **kwargs)
+    except BrokenProcessPool:
+        # A worker died (killed, out of memory): start a fresh pool and try once more
+        reset_pool(executor)
+        try:
+            future = spawn_submit(get_pool(), func, *args, **kwargs)
+        except BaseException:
+            slots.release()
+            raise
+    except BaseException:
+        slots.release()
+        raise
+
+    with lock:
+        counts['submitted'] += 1
+        pending.add(future)
+        superseded = latest.get(key) if key is not None else None
+        if key is not None:
+            latest[key] = future
+    if superseded is not None:
+        superseded.cancel()
+    future.add_done_callback(lambda done: finished(done, key))
+    return future
+
+def call(func, *args, timeout=DEFAULT_TIMEOUT, key=None, on_wait=None, **kwargs):
+    # Runs func(*args, **kwargs) in the pool and waits for it, calling on_wait(elapsed) every POLL seconds.
+    # Raises TimeoutError after timeout seconds, CancelledError when a newer job with the same key replaced it
+    # and BrokenProcessPool when its worker died (the next submit starts a fresh pool)
+    start = time.perf_counter()
+    future = submit(func, *args, timeout=timeout, key=key, **kwargs)
+    try:
+        while True:
+            elapsed = time.perf_counter() - start
+            if elapsed >= timeout:
+                with lock:
+                    counts['timed_out'] += 1
+                raise TimeoutError(f"{job_name(func)} did not finish within {timeout:g} s")
+            # done() is also true for a cancelled job, which wait() only reports once the executor gets to it
+            wait([future], timeout=min(POLL, timeout - elapsed))
+            if future.done():
+                try:
+                    return future.result()
+                except CancelledError:
+                    raise CancelledError(f"{job_name(func)} was replaced by a newer request") from None
+            if on_wait is not None:
+                on_wait(elapsed)
+    finally:
+        if not future.done():
+            future.cancel()
+
+def run_in_page(func, *args, label='Working', timeout=DEFAULT_TIMEOUT, **kwargs):
+    # call() for the page scripts, keyed on the session and showing the elapsed time while waiting. Every
+    # update is a Streamlit call, which is where a newer rerun stops this one; call() then cancels the job
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    key = (ctx.session_id if ctx else None, job_name(func))
+    status = st.empty()
+    try:
+        return call(func, *args, timeout=timeout, key=key,
+                    on_wait=lambda elapsed: status.caption(f'{label}... {elapsed:.1f} s'), **kwargs)
+    finally:
+        status.empty()
+
+def stats():
+    # The executor marks a few queued jobs as running early, so anything beyond the worker count counts as queued
+    with lock:
+        in_flight = len(pending)
+        result = dict(counts)
+    running = min(in_flight, WORKERS)
+    result.update(workers=WORKERS, max_jobs=MAX_JOBS, running=running, queued=in_flight - running)
+    return result
+
+metrics.register_gauge('offload_queue_depth', lambda: stats()['queued'])
+metrics.register_gauge('offload_running', lambda: stats()['running'])
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+import numpy as np
+from functools import lru_cache
+from core import phasor_points
+
+# Slider ranges of the short transmission line page (integer steps)
+VR_MAX, ANGLE_MAX, CURRENT_MAX = 100, 360, 50
+
+# Last axis of the grid: Vr_x, Vr_y, Ir_x, Ir_y, Ix_x, Ix_y
+GRID_PATH = os.environ.get('PHASOR_GRID_PATH', os.path.join(tempfile.gettempdir(), 'phasor_grid.npy'))
+
+def build_grid(path=GRID_PATH):
+    Vr = np.arange(VR_MAX + 1, dtype=np.float32)[:, None, None]
+    angle = np.arange(ANGLE_MAX + 1, dtype=np.float32)[None, :, None]
+    current = np.arange(CURRENT_MAX + 1, dtype=np.float32)[None, None, :]
+
+    # Written to a temporary file and renamed, so concurrent readers never see a partial grid
+    fd, tmp = tempfile.mkstemp(suffix='.npy', dir=os.path.dirname(path) or '.')
+    os.close(fd)
+    grid = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32,
+                                     shape=(VR_MAX + 1, ANGLE_MAX + 1, CURRENT_MAX + 1, 6))
+    for i, values in enumerate(phasor_points(Vr, angle, current)):
+        grid[..., i] = values
+    grid.flush()
+    del grid
+    os.replace(tmp, path)
+    return path
+
+@lru_cache(maxsize=None)
+def load_grid(path=GRID_PATH):
+    # Memory-mapped read-only: every session and worker process shares the OS page cache
+    if not os.path.exists(path):
+        build_grid(path)
+    return np.load(path, mmap_mode='r')
+
+def scale_drops(values, resistance, reactance):
+    # The grid holds unit drops (I * 1 Ω); the I*R and I*X drops scale them by the line's R and X.
+    # values has the grid's last axis; any leading axes are kept
+    values = np.array(values, dtype=float)
+    Vr_x, Ir_x, Ir_y, Ix_y = values[..., 0], values[..., 2], values[..., 3], values[..., 5]
+    values[..., 2] = Vr_x + (Ir_x - Vr_x) * resistance
+    values[..., 4] = values[..., 2]
+    values[..., 5] = Ir_y + (Ix_y - Ir_y) * reactance
+    return values
+
+def lookup(Vr, angle, current, resistance=1.0, reactance=1.0, path=GRID_PATH):
+    on_grid = all(float(v).is_integer() for v in (Vr, angle, current)) \
+        and 0 <= Vr <= VR_MAX and 0 <= angle <= ANGLE_MAX and 0 <= current <= CURRENT_MAX
+    if not on_grid:
+        values = np.array(phasor_points(Vr, angle, current), dtype=float)
+    else:
+        values = load_grid(path)[int(Vr), int(angle), int(current)]
+    Vr_x, Vr_y, Ir_x, Ir_y, Ix_x, Ix_y = (float(v) for v in scale_drops(values, resistance, reactance))
+    return (Vr_x, Vr_y), (Ir_x, Ir_y), (Ix_x, Ix_y)
+
+def angle_sweep(Vr, current, step=1, resistance=1.0, reactance=1.0, path=GRID_PATH):
+    # All angles for one (Vr, current) pair, shape (angles, 6), with the same R and X scaling as lookup
+    on_grid = all(float(v).is_integer() for v in (Vr, current)) and 0 <= Vr <= VR_MAX and 0 <= current <= CURRENT_MAX
+    if not on_grid:
+        angles = np.arange(0, ANGLE_MAX + 1, step, dtype=float)
+        values = np.stack(np.broadcast_arrays(*phasor_points(Vr, angles, current)), axis=-1)
+    else:
+        values = load_grid(path)[int(Vr), ::step, int(current)]
+    return scale_drops(values, resistance, reactance)
+
+if __name__ == '__main__':
+    print(f'Phasor grid written to {build_grid(sys.argv[1] if len(sys.argv) > 1 else GRID_PATH)}')
@@ -1,61 +1,109 @@
+import shutil
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon
-import schemdraw
-import schemdraw.elements as elm
-import sympy as sp
-
-def calculate_power_triangle(voltage, current, phase_angle):
-    p = voltage * current * np.cos(np.radians(phase_angle))
-    q = voltage * current * np.sin(np.radians(phase_angle))
-    s = voltage * current
-    return p, q, s
-
-def calculate_imped_triangle(voltage, current, phase_angle):
-    res = (voltage / current) * np.cos(np.radians(phase_angle))
-    reac = (voltage / current) * np.sin(np.radians(phase_angle))
-    imped = np.sqrt(res**2 + reac**2)
-    return res, reac, imped
-
-def plot_power_triangle(p, q, s, angle):
-    fig, ax = plt.subplots(figsize=(6, 6))
-    ax.set_xlim(0, s + 5)
-    ax.set_ylim(0, s + 5)
-
-    vertices = [(0, 0), (p, 0), (p, q)]
-    triangle = Polygon(vertices, closed=True, edgecolor='black', linewidth=2, fill=None)
-    ax.add_patch(triangle)
-
-    ax.text(p / 2, -1, f'Real Power: {p:.2f}', ha='center')
-    ax.text(p + 1, q / 2, f'Reactive Power: {q:.2f}', va='center', rotation=90)
-    ax.text(p / 2, q / 2, f'Apparent Power: {s:.2f}', ha='center', va='center', rotation=angle)
-
-    ax.set_xlabel('Real Power')
-    ax.set_ylabel('Reactive Power')
-
-    st.pyplot(fig)
-
-def plot_imped_triangle(res, reac, imped, angle):
-    fig, ax = plt.subplots(figsize=(6, 6))
-    ax.set_xlim(0, imped + 5)
-    ax.set_ylim(0, imped + 5)
-
-    vertices = [(0, 0), (res, 0), (res, reac)]
-    triangle = Polygon(vertices, closed=True, edgecolor='black', linewidth=2, fill=None)
-    ax.add_patch(triangle)
-
-    ax.text(res / 2, -1, f'res: {res:.2f}', ha='center')
-    ax.text(res + 1, reac / 2, f'reac: {reac:.2f}', va='center', rotation=90)
-    ax.text(res / 2, reac / 2, f'imped: {imped:.2f}', ha='center', va='center', rotation=angle)
-
-    ax.set_xlabel('res')
-    ax.set_ylabel('reac')
-
-    st.pyplot(fig)
+import core
+import metrics
+import rendering
+import session_files
+
+def plot_power_triangle(p, q, s, angle, renderer='Plotly', d=None):
+    # With a distortion power d the vertical leg is the non-active power sqrt(q^2 + d^2)
+    if renderer == 'Plotly':
+        with metrics.stage('figure'):
+            fig = rendering.plotly_power_triangle(p, q, s, angle, d)
+        with metrics.stage('render'):
+            st.plotly_chart(fig)
+        return
+    if d is None:
+        triangle = rendering.session_figure(st.session_state, 'power_triangle_figure', rendering.power_triangle_figure)
+        with metrics.stage('figure'):
+            fig = triangle.update(p, q, s, angle)
+    else:
+        triangle = rendering.session_figure(st.session_state, 'distortion_triangle_figure',
+                                            rendering.distortion_triangle_figure)
+        with metrics.stage('figure'):
+            fig = triangle.update(p, np.hypot(q, d), s, angle, rendering.distortion_note(q, d))
+    with metrics.stage('render'):
+        st.pyplot(fig)
+
+def plot_imped_triangle(res, reac, imped, angle, renderer='Plotly'):
+    if renderer == 'Plotly':
+        with metrics.stage('figure'):
+            fig = rendering.plotly_imped_triangle(res, reac, imped, angle)
+        with metrics.stage('render'):
+            st.plotly_chart(fig)
+        return
+    triangle = rendering.session_figure(st.session_state, 'imped_triangle_figure', rendering.imped_triangle_figure)
+    with metrics.stage('figure'):
+        fig = triangle.update(res, reac, imped, angle)
+    with metrics.stage('render'):
+        st.pyplot(fig)
+
+def waveform_file(uploaded):
+    # The upload is copied to a temporary file once per session so it can be memory-mapped. The copy is a
+    # session_files.SessionFile, removed when the next upload replaces it, the upload is cleared or the session ends
+    key = uploaded.file_id
+    if st.session_state.get('waveform_key') != key:
+        suffix = '.npy' if uploaded.name.lower().endswith('.npy') else '.bin'
+        copy = session_files.SessionFile(suffix)
+        with open(copy.path, 'wb') as out:
+            uploaded.seek(0)
+            shutil.copyfileobj(uploaded, out)
+        st.session_state['waveform_file'] = copy
+        st.session_state['waveform_key'] = key
+    return st.session_state['waveform_file'].path
+
+def release_waveform():
+    for key in ('waveform_file', 'waveform_key', 'waveform_params', 'waveform_result'):
+        st.session_state.pop(key, None)
+
+def waveform_section(renderer):
+    import pandas as pd
+    import waveform
+
+    uploaded = st.file_uploader('Upload V/I Waveform (.npy, or raw interleaved float32)', type=['npy', 'bin', 'dat'])
+    fs = st.number_input('Sample Rate (Hz)', min_value=1.0, value=10000.0)
+    f0 = st.number_input('Fundamental Frequency (Hz)', min_value=0.1, value=50.0)
+    cycles = st.number_input('Cycles per Window', min_value=1, step=1, value=10)
+    if uploaded is None:
+        release_waveform()
+        return
+
+    # Analyzed once per file and settings; picking another window only re-plots
+    params = (waveform_file(uploaded), fs, f0, int(cycles))
+    if st.session_state.get('waveform_params') != params:
+        try:
+            with metrics.stage('compute'):
+                st.session_state['waveform_result'] = waveform.analyze_file(*params)
+        except ValueError as exc:
+            st.write(f'Waveform not analyzed: {exc}')
+            return
+        st.session_state['waveform_params'] = params
+    result = st.session_state['waveform_result']
+
+    windows = len(result['p'])
+    window = st.number_input(f'Window (0 - {windows - 1})', min_value=0, max_value=windows - 1, step=1, value=0)
+    p, q, s, d, pf, phase = (float(result[key][window]) for key in ('p', 'q', 's', 'd', 'pf', 'phase'))
+    st.write(f"Vrms: {result['vrms'][window]:.2f} V, Irms: {result['irms'][window]:.2f} A, "
+             f"Power factor: {pf:.4f}, Phase: {phase:.2f}°")
+    st.write(f"THD: V {result['thd_v'][window] * 100:.2f} %, I {result['thd_i'][window] * 100:.2f} %, "
+             f"Distortion power: {d:.2f} VA")
+    st.subheader('Power Triangle')
+    # The triangle's angle is the true power factor angle, which includes the distortion
+    plot_power_triangle(p, q, s, np.degrees(np.arccos(np.clip(np.nan_to_num(pf, nan=1.0), -1, 1))), renderer, d)
+
+    st.subheader('Harmonics (RMS)')
+    st.bar_chart(pd.DataFrame({'V': np.abs(result['V'][window]), 'I': np.abs(result['I'][window])},
+                              index=result['harmonics']))
+    st.subheader('Power per Window')
+    st.line_chart(pd.DataFrame({key: result[key] for key in ('p', 'q', 's', 'd')}, index=result['time']))
 
 def main():
-    option = st.sidebar.radio('Select',['Power Triangle', 'imped Triangle'])
+    option = st.sidebar.radio('Select',['Power Triangle', 'imped Triangle', 'Waveform Analysis'])
+    page_figures = {'Power Triangle': 'power_triangle_figure', 'imped Triangle': 'imped_triangle_figure',
+                    'Waveform Analysis': 'distortion_triangle_figure'}
+    renderer = st.sidebar.radio('Renderer', ['Plotly', 'Matplotlib (static)'])
+    rendering.release_figures(st.session_state, keep=(page_figures.get(option),) if renderer != 'Plotly' else ())
 
     if option == 'Power Triangle':
         st.subheader('Select the type of triangle in the sidebar: imped / Power')
@@ -63,9 +111,10 @@ def main():
         voltage = st.slider('Voltage', min_value=0, max_value=100, value=50)
         current = st.slider('Current', min_value=0, max_value=100, value=25)
         phase_angle = st.slider('Phase Angle', min_value=0, max_value=90, value=30)
-        p, q, s = calculate_power_triangle(voltage, current, phase_angle)
+        with metrics.stage('compute'):
+            p, q, s = core.calculate_power_triangle(voltage, current, phase_angle)
         st.subheader('Power Triangle')
-        plot_power_triangle(p, q, s, phase_angle)
+        plot_power_triangle(p, q, s, phase_angle, renderer)
 
     elif option == 'imped Triangle':
         st.subheader('Select the type of triangle in the sidebar: imped / Power')
@@ -73,12 +122,22 @@ def main():
         voltage = st.slider('Voltage', min_value=0, max_value=100, value=10)
         current = st.slider('Current', min_value=0, max_value=100, value=5)
         phase_angle = st.slider('Phase Angle', min_value=0, max_value=90, value=0)
-        res, reac, imped = calculate_imped_triangle(voltage, current, phase_angle)
+        with metrics.stage('compute'):
+            res, reac, imped = core.calculate_imped_triangle(voltage, current, phase_angle)
         st.subheader('imped Triangle')
-        plot_imped_triangle(res, reac, imped, phase_angle)
+        if np.ma.is_masked(imped):
+            st.write('imped is undefined at zero current')
+            return
+        plot_imped_triangle(float(res), float(reac), float(imped), phase_angle, renderer)
+
+    elif option == 'Waveform Analysis':
+        st.title('Power Triangle from Waveforms')
+        waveform_section(renderer)
 
 if __name__ == '__main__':
-    main()
+    with metrics.rerun('pwer'):
+        main()
+    metrics.panel()
 
 # Copyright text at the bottom
 st.sidebar.markdown(
@@ -0,0 +1,189 @@
+import io
+import numpy as np
+
+# Figures are built with matplotlib.figure.Figure rather than pyplot, so they
+# never enter pyplot's global figure registry: concurrent sessions do not share
+# state and a figure is freed as soon as its owner drops it. matplotlib is
+# imported when the first figure is created, so Plotly-only sessions skip it.
+
+class PhasorFigure:
+    arrows = (('Vs', 'blue'), ('Vr', 'green'), ('Ir', 'red'), ('Ix', 'purple'))
+
+    def __init__(self):
+        from matplotlib.figure import Figure
+        from matplotlib.patches import FancyArrow
+
+        self.fig = Figure(figsize=(8, 8))
+        self.ax = self.fig.add_subplot()
+        self.patches = {}
+        self.labels = {}
+        for name, color in self.arrows:
+            self.patches[name] = self.ax.add_patch(
+                FancyArrow(0, 0, 0, 0, head_width=0.5, head_length=0.5, fc=color, ec=color, label=name))
+            self.labels[name] = self.ax.text(0, 0, name, color=color, fontsize=12, ha='right', va='bottom')
+
+        self.ax.set_xlabel('Real')
+        self.ax.set_ylabel('Imaginary')
+        self.ax.set_title('Phasor Diagram')
+        self.ax.axhline(0, color='black', linewidth=0.5)
+        self.ax.axvline(0, color='black', linewidth=0.5)
+        self.ax.grid(color='gray', linestyle='--', linewidth=0.5)
+        self.ax.legend()
+
+    def update(self, Vr_xy, Ir_xy, Ix_xy):
+        # Each arrow runs from start to end; artists are moved, never re-created
+        segments = {'Vs': ((0, 0), Ix_xy), 'Vr': ((0, 0), Vr_xy), 'Ir': (Vr_xy, Ir_xy), 'Ix': (Ir_xy, Ix_xy)}
+        for name, ((x0, y0), (x1, y1)) in segments.items():
+            self.patches[name].set_data(x=x0, y=y0, dx=x1 - x0, dy=y1 - y0)
+            self.labels[name].set_position(((x0 + x1) / 2, (y0 + y1) / 2))
+
+        points = np.array([(0, 0), Vr_xy, Ir_xy, Ix_xy], dtype=float)
+        low, high = points.min(axis=0), points.max(axis=0)
+        pad = 0.05 * (high - low) + 1
+        self.ax.set_xlim(low[0] - pad[0], high[0] + pad[0])
+        self.ax.set_ylim(low[1] - pad[1], high[1] + pad[1])
+        return self.fig
+
+    def close(self):
+        self.fig.clear()
+
+class TriangleFigure:
+    def __init__(self, base_name, side_name, hyp_name, xlabel, ylabel):
+        from matplotlib.figure import Figure
+        from matplotlib.patches import Polygon
+
+        self.names = (base_name, side_name, hyp_name)
+        self.fig = Figure(figsize=(6, 6))
+        self.ax = self.fig.add_subplot()
+        self.triangle = self.ax.add_patch(
+            Polygon([(0, 0), (0, 0), (0, 0)], closed=True, edgecolor='black', linewidth=2, fill=None))
+        self.base = self.ax.text(0, -1, '', ha='center')
+        self.side = self.ax.text(0, 0, '', va='center', rotation=90)
+        self.hyp = self.ax.text(0, 0, '', ha='center', va='center')
+        self.note = self.ax.text(0.02, 0.98, '', transform=self.ax.transAxes, va='top')
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+
+    def update(self, x, y, h, angle, note=''):
+        base_name, side_name, hyp_name = self.names
+        self.ax.set_xlim(0, h + 5)
+        self.ax.set_ylim(0, h + 5)
+        self.triangle.set_xy([(0, 0), (x, 0), (x, y)])
+
+        self.base.set_position((x / 2, -1))
+        self.base.set_text(f'{base_name}: {x:.2f}')
+        self.side.set_position((x + 1, y / 2))
+        self.side.set_text(f'{side_name}: {y:.2f}')
+        self.hyp.set_position((x / 2, y / 2))
+        self.hyp.set_text(f'{hyp_name}: {h:.2f}')
+        self.hyp.set_rotation(angle)
+        self.note.set_text(note)
+        return self.fig
+
+    def close(self):
+        self.fig.clear()
+
+def power_triangle_figure():
+    return TriangleFigure('Real Power', 'Reactive Power', 'Apparent Power', 'Real Power', 'Reactive Power')
+
+def distortion_triangle_figure():
+    # Power triangle of a distorted wave: the vertical leg is the non-active power sqrt(Q^2 + D^2)
+    return TriangleFigure('Real Power', 'Non-active Power', 'Apparent Power', 'Real Power', 'Non-active Power')
+
+def distortion_note(q, d):
+    return f'Reactive Power Q: {q:.2f}, Distortion Power D: {d:.2f}'
+
+def imped_triangle_figure():
+    return TriangleFigure('res', 'reac', 'imped', 'res', 'reac')
+
+def session_figure(state, key, factory):
+    # One figure per plot per session, reused across reruns
+    if key not in state:
+        state[key] = factory()
+    return state[key]
+
+def release_figures(state, keep=()):
+    # Free the figures of pages that are no longer shown
+    for key in [key for key in state.keys() if str(key).endswith('_figure') and key not in keep]:
+        state[key].close()
+        del state[key]
+
+def figure_png(fig):
+    # The image st.pyplot would send for fig, as bytes that can be cached and passed to st.image
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=200)
+    return buffer.getvalue()
+
+# Plotly versions of the same plots: only the trace data is sent and the
+# browser does the drawing. plotly is imported on first use.
+
+def plotly_triangle(names, x, y, h, angle):
+    import plotly.graph_objects as go
+
+    base_name, side_name, hyp_name = names
+    fig = go.Figure(go.Scatter(x=[0, x, x, 0], y=[0, 0, y, 0], mode='lines', line=dict(color='black', width=2),
+                               hoverinfo='skip', showlegend=False))
+    fig.add_annotation(x=x / 2, y=0, text=f'{base_name}: {x:.2f}', showarrow=False, yshift=-10)
+    fig.add_annotation(x=x, y=y / 2, text=f'{side_name}: {y:.2f}', showarrow=False, textangle=-90, xshift=12)
+    fig.add_annotation(x=x / 2, y=y / 2, text=f'{hyp_name}: {h:.2f}', showarrow=False, textangle=-angle)
+    fig.update_xaxes(range=[0, h + 5], title=base_name)
+    fig.update_yaxes(range=[0, h + 5], title=side_name, scaleanchor='x')
+    fig.update_layout(width=600, height=600)
+    return fig
+
+def plotly_power_triangle(p, q, s, angle, d=None):
+    if d is None:
+        return plotly_triangle(('Real Power', 'Reactive Power', 'Apparent Power'), p, q, s, angle)
+    fig = plotly_triangle(('Real Power', 'Non-active Power', 'Apparent Power'), p, np.hypot(q, d), s, angle)
+    fig.add_annotation(x=0.02, y=0.98, xref='paper', yref='paper', xanchor='left', showarrow=False,
+                       text=distortion_note(q, d))
+    return fig
+
+def plotly_imped_triangle(res, reac, imped, angle):
+    return plotly_triangle(('res', 'reac', 'imped'), res, reac, imped, angle)
+
+def plotly_phasor(Vr_xy, Ir_xy, Ix_xy):
+    import plotly.graph_objects as go
+
+    segments = {'Vs': ((0, 0), Ix_xy), 'Vr': ((0, 0), Vr_xy), 'Ir': (Vr_xy, Ir_xy), 'Ix': (Ir_xy, Ix_xy)}
+    fig = go.Figure()
+    for name, color in PhasorFigure.arrows:
+        (x0, y0), (x1, y1) = segments[name]
+        fig.add_trace(go.Scatter(x=[x0, x1], y=[y0, y1], mode='lines', name=name, line=dict(color=color)))
+        fig.add_annotation(x=x1, y=y1, ax=x0, ay=y0, xref='x', yref='y', axref='x', ayref='y',
+                           showarrow=True, arrowhead=2, arrowcolor=color, text='')
+        fig.add_annotation(x=(x0 + x1) / 2, y=(y0 + y1) / 2, text=name, showarrow=False,
+                           font=dict(color=color, size=14), xanchor='right', yanchor='bottom')
+
+    fig.update_xaxes(title='Real', zeroline=True, zerolinecolor='black', gridcolor='lightgray', griddash='dash')
+    fig.update_yaxes(title='Imaginary', zeroline=True, zerolinecolor='black', gridcolor='lightgray', griddash='dash',
+                     scaleanchor='x')
+    fig.update_layout(title='Phasor Diagram', width=800, height=800, plot_bgcolor='white')
+    return fig
+
+def plotly_phasor_sweep(sweep, angles):
+    # sweep rows are (Vr_x, Vr_y, Ir_x, Ir_y, Ix_x, Ix_y); the browser animates the frames
+    import plotly.graph_objects as go
+
+    def traces(row):
+        Vr_x, Vr_y, Ir_x, Ir_y, Ix_x, Ix_y = row
+        segments = {'Vs': ((0, 0), (Ix_x, Ix_y)), 'Vr': ((0, 0), (Vr_x, Vr_y)),
+                    'Ir': ((Vr_x, Vr_y), (Ir_x, Ir_y)), 'Ix': ((Ir_x, Ir_y), (Ix_x, Ix_y))}
+        return [go.Scatter(x=[x0, x1], y=[y0, y1], mode='lines+markers', name=name, line=dict(color=color),
+                           marker=dict(size=[0, 8]))
+                for name, color in PhasorFigure.arrows for (x0, y0), (x1, y1) in [segments[name]]]
+
+    limit = float(np.abs(sweep).max()) + 1
+    frames = [go.Frame(data=traces(row), name=str(angle)) for row, angle in zip(sweep, angles)]
+    fig = go.Figure(data=traces(sweep[0]), frames=frames)
+    fig.update_xaxes(title='Real', range=[-limit, limit], zeroline=True, zerolinecolor='black')
+    fig.update_yaxes(title='Imaginary', range=[-limit, limit], zeroline=True, zerolinecolor='black', scaleanchor='x')
+    fig.update_layout(
+        title='Phasor Diagram (angle sweep)', width=800, height=800, plot_bgcolor='white',
+        updatemenus=[dict(type='buttons', buttons=[dict(label='Play', method='animate', args=[None, dict(
+            frame=dict(duration=50, redraw=False), fromcurrent=True)])])],
+        sliders=[dict(currentvalue=dict(prefix='angle: '), steps=[dict(
+            label=str(angle), method='animate', args=[[str(angle)], dict(mode='immediate', frame=dict(redraw=False))])
+            for angle in angles])],
+    )
+    return fig
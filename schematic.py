@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+import schemdraw
+import schemdraw.elements as elm
+
+comMap = {
+    'Resistor': (elm.Resistor, 'Ω'),
+    'Inductor': (elm.Inductor, 'H'),
+    'Capacitor': (elm.Capacitor, 'F')
+}
+
+CACHE_SIZE = 128
+
+# Lives outside the Streamlit scripts so the cache survives reruns, which
+# re-execute the page script in a fresh namespace every time
+cache = OrderedDict()
+counts = {'hits': 0, 'misses': 0}
+lock = threading.Lock()
+
+def draw_series_svg(component_key):
+    # component_key is a tuple of (type, value); the source is labelled
+    # generically so voltage changes reuse the cached diagram
+    d = schemdraw.Drawing(canvas='svg', show=False)
+    for i, (compType, compVal) in enumerate(component_key):
+        compClass, compUnit = comMap[compType]
+
+        if i > 0:
+            d.add(elm.Dot())
+
+        d.add(compClass(label=f'{compVal}{compUnit}'))
+
+    d.add(elm.SourceV(label='V'))
+    return d.get_imagedata('svg').decode()
+
+def render_series_svg(component_key, run=None):
+    # LRU cache on the component tuple; a miss is drawn by run(draw_series_svg, component_key)
+    # when given, e.g. offload.run_in_page to keep schemdraw off the session's thread
+    with lock:
+        if component_key in cache:
+            cache.move_to_end(component_key)
+            counts['hits'] += 1
+            return cache[component_key]
+        counts['misses'] += 1
+
+    svg = draw_series_svg(component_key) if run is None else run(draw_series_svg, component_key)
+    with lock:
+        cache[component_key] = svg
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    return svg
+
+def series_key(components):
+    return tuple((component['type'], component['value']) for component in components)
+
+def cache_stats():
+    with lock:
+        return {'hits': counts['hits'], 'misses': counts['misses'], 'size': len(cache), 'maxsize': CACHE_SIZE}
@@ -0,0 +1,323 @@
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import core
+import dispatch
+
+# Local HTTP/JSON service around the calculations, for callers that have no use
+# for the Streamlit pages. Requests that arrive within a few milliseconds of each
+# other are coalesced into one vectorized call per endpoint; dispatch batches run
+# in a process pool so solves never block the event loop, and every answer is
+# cached on its normalized request body.
+#
+#   POST /triangle   {"voltage": 230, "current": [5, 0], "phase": 30}
+#   POST /impedance  {"components": [{"type": "Resistor", "value": 10}], "freq": [50, 60], "voltage": 10}
+#   POST /dispatch   {"coefficients": [[0.004, 5.3, 500], [0.006, 5.5, 400]], "demand": [300, 800]}
+#   GET  /stats
+
+MAX_BATCH = 1024
+MAX_DELAY = 0.002
+
+STATUS = {200: '200 OK', 400: '400 Bad Request', 404: '404 Not Found', 405: '405 Method Not Allowed',
+          500: '500 Internal Server Error'}
+
+def normalize(payload):
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'))
+
+def to_list(values):
+    # JSON has no NaN or masked values; both become null
+    values = np.ma.masked_invalid(np.ma.asarray(values, dtype=float)).filled(np.nan)
+    return [None if np.isnan(value) else float(value) for value in np.ravel(values)]
+
+def unwrap(result, scalar):
+    return {key: value[0] if scalar and isinstance(value, list) else value for key, value in result.items()}
+
+def triangle_batch(payloads):
+    # Every payload is broadcast to rows, all rows go through core in one call and are split back
+    rows, results = [], [None] * len(payloads)
+    for k, payload in enumerate(payloads):
+        try:
+            voltage, current, phase = np.broadcast_arrays(*(np.asarray(payload[name], dtype=float)
+                                                            for name in ('voltage', 'current', 'phase')))
+        except (KeyError, TypeError, ValueError) as exc:
+            results[k] = ValueError(f"Bad triangle request: {exc}")
+            continue
+        rows.append((k, voltage.ndim == 0, voltage.ravel(), current.ravel(), phase.ravel()))
+
+    if rows:
+        voltage, current, phase = (np.concatenate([row[i] for row in rows]) for i in (2, 3, 4))
+        p, q, s = core.calculate_power_triangle(voltage, current, phase)
+        res, reac, imped = core.calculate_imped_triangle(voltage, current, phase)
+        bounds = np.cumsum([0] + [len(row[2]) for row in rows])
+        for (k, scalar, *_), lo, hi in zip(rows, bounds[:-1], bounds[1:]):
+            results[k] = unwrap({name: to_list(values[lo:hi]) for name, values in
+                                 (('p', p), ('q', q), ('s', s), ('res', res), ('reac', reac), ('imped', imped))}, scalar)
+    return results
+
+def impedance_batch(payloads):
+    # Requests for the same series chain share one call over all their frequencies
+    groups, results = defaultdict(list), [None] * len(payloads)
+    for k, payload in enumerate(payloads):
+        try:
+            components = [{'type': str(c['type']), 'value': float(c['value'])} for c in payload['components']]
+            freq = np.asarray(payload.get('freq', 1.0), dtype=float)
+            voltage = payload.get('voltage')
+            voltage = None if voltage is None else float(voltage)
+        except (KeyError, TypeError, ValueError) as exc:
+            results[k] = ValueError(f"Bad impedance request: {exc}")
+            continue
+        groups[normalize(components)].append((k, freq.ndim == 0, freq.ravel(), voltage, components))
+
+    for members in groups.values():
+        freqs = np.concatenate([member[2] for member in members])
+        totImp = core.series_impedance(members[0][4], freqs) + 0j * freqs
+        bounds = np.cumsum([0] + [len(member[2]) for member in members])
+        for (k, scalar, _, voltage, _), lo, hi in zip(members, bounds[:-1], bounds[1:]):
+            z = totImp[lo:hi]
+            result = {'real': to_list(z.real), 'imag': to_list(z.imag), 'magnitude': to_list(np.abs(z)),
+                      'phase': to_list(np.degrees(np.angle(z)))}
+            if voltage is not None:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    result['current'] = to_list(voltage / np.abs(z))
+            results[k] = unwrap(result, scalar)
+    return results
+
+def dispatch_batch(payloads):
+    # Runs in a worker process. Lambda-iteration requests for the same fleet are one
+    # batch_dispatch over all their demands; other solvers are solved one by one
+    groups, results = defaultdict(list), [None] * len(payloads)
+    for k, payload in enumerate(payloads):
+        try:
+            coefficients = np.asarray(payload['coefficients'], dtype=float).reshape(-1, 3)
+            demand = np.asarray(payload['demand'], dtype=float)
+            p_min = None if payload.get('p_min') is None else np.asarray(payload['p_min'], dtype=float)
+            p_max = None if payload.get('p_max') is None else np.asarray(payload['p_max'], dtype=float)
+            solver = payload.get('solver', 'Lambda iteration')
+        except (KeyError, TypeError, ValueError) as exc:
+            results[k] = ValueError(f"Bad dispatch request: {exc}")
+            continue
+        key = normalize([coefficients.tolist(), None if p_min is None else p_min.tolist(),
+                         None if p_max is None else p_max.tolist(), solver])
+        groups[key].append((k, demand.ndim == 0, demand.ravel(), coefficients, p_min, p_max, solver))
+
+    for members in groups.values():
+        _, _, _, coefficients, p_min, p_max, solver = members[0]
+        demands = np.concatenate([member[2] for member in members])
+        try:
+            if solver == 'Lambda iteration' and len(coefficients) and np.all(coefficients[:, 0] > 0):
+                loads, lam = dispatch.batch_dispatch(coefficients, demands, p_min, p_max)
+            else:
+                solved = [dispatch.solve_dispatch(coefficients, demand, solver, p_min, p_max) for demand in demands]
+                loads = np.array([np.full(len(coefficients), np.nan) if x is None else x for x, _ in solved])
+                lam = np.array([np.nan if l is None else l for _, l in solved])
+        except ValueError as exc:
+            for k, *_ in members:
+                results[k] = ValueError(f"Bad dispatch request: {exc}")
+            continue
+
+        bounds = np.cumsum([0] + [len(member[2]) for member in members])
+        for (k, scalar, *_), lo, hi in zip(members, bounds[:-1], bounds[1:]):
+            # Infeasible demands come back with null loads and lambda
+            result = {'loads': [to_list(row) for row in loads[lo:hi]], 'lambda': to_list(lam[lo:hi])}
+            results[k] = unwrap(result, scalar)
+    return results
+
+class ResultCache:
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+class MicroBatcher:
+    # Collects submissions until max_batch arrive or max_delay passes, then runs them as one call
+    def __init__(self, run, max_batch=MAX_BATCH, max_delay=MAX_DELAY):
+        self.run = run
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending = []
+        self.timer = None
+        self.batches = self.items = 0
+
+    async def submit(self, payload):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((payload, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            asyncio.ensure_future(self.execute(batch))
+
+    async def execute(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await self.run([payload for payload, _ in batch])
+        except Exception as exc:
+            results = [exc] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+class Service:
+    def __init__(self, workers=2, max_batch=MAX_BATCH, max_delay=MAX_DELAY, cache_size=10000):
+        self.pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        self.cache = ResultCache(cache_size)
+        self.routes = {
+            '/triangle': MicroBatcher(self.inline(triangle_batch), max_batch, max_delay),
+            '/impedance': MicroBatcher(self.inline(impedance_batch), max_batch, max_delay),
+            '/dispatch': MicroBatcher(self.in_pool(dispatch_batch), max_batch, max_delay),
+        }
+        self.latency = defaultdict(lambda: deque(maxlen=10000))
+        self.requests = 0
+        self.started = time.perf_counter()
+
+    def inline(self, function):
+        # Vectorized NumPy calls that finish in well under a millisecond stay on the loop
+        async def run(payloads):
+            return function(payloads)
+        return run
+
+    def in_pool(self, function):
+        async def run(payloads):
+            return await asyncio.get_running_loop().run_in_executor(self.pool, function, payloads)
+        return run
+
+    async def call(self, path, payload):
+        key = (path, normalize(payload))
+        result = self.cache.get(key)
+        if result is None:
+            result = await self.routes[path].submit(payload)
+            self.cache.put(key, result)
+        return result
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        routes = {}
+        for path, batcher in self.routes.items():
+            latency = np.array(self.latency[path]) * 1000
+            routes[path] = {
+                'requests': len(latency), 'batches': batcher.batches,
+                'mean_batch': batcher.items / batcher.batches if batcher.batches else 0.0,
+                'p50_ms': float(np.percentile(latency, 50)) if len(latency) else None,
+                'p99_ms': float(np.percentile(latency, 99)) if len(latency) else None,
+            }
+        return {'requests': self.requests, 'requests_per_s': self.requests / elapsed, 'routes': routes,
+                'cache': {'hits': self.cache.hits, 'misses': self.cache.misses, 'size': len(self.cache.entries)}}
+
+    async def respond(self, method, path, body):
+        if path == '/stats':
+            return 200, self.stats()
+        if path not in self.routes:
+            return 404, {'error': f'Unknown path {path}'}
+        if method != 'POST':
+            return 405, {'error': 'Use POST'}
+
+        start = time.perf_counter()
+        try:
+            result = await self.call(path, json.loads(body or b'{}'))
+        except (ValueError, TypeError) as exc:
+            return 400, {'error': str(exc)}
+        except Exception as exc:
+            return 500, {'error': f'{type(exc).__name__}: {exc}'}
+        self.latency[path].append(time.perf_counter() - start)
+        self.requests += 1
+        return 200, result
+
+    async def handle(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive: JSON bodies sized by Content-Length
+        try:
+            while True:
+                request = await reader.readline()
+                if not request:
+                    break
+                method, path, _ = request.decode('latin-1').split(' ', 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, response = await self.respond(method, path.split('?')[0], body)
+                data = json.dumps(response).encode()
+                writer.write(f'HTTP/1.1 {STATUS[status]}\r\nContent-Type: application/json\r\n'
+                             f'Content-Length: {len(data)}\r\n\r\n'.encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(host, port, **options):
+    service = Service(**options)
+    server = await asyncio.start_server(service.handle, host, port)
+
+    # SIGTERM stops the server like Ctrl-C, so the dispatch workers are shut down with it
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signum, server.close)
+        except NotImplementedError:
+            pass
+
+    print(f'Serving on http://{host}:{port}', flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if service.pool is not None:
+            service.pool.shutdown(cancel_futures=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batching JSON service for triangle, impedance and dispatch')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=2, help='dispatch worker processes (0 runs in a thread)')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-delay-ms', type=float, default=MAX_DELAY * 1000)
+    parser.add_argument('--cache-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, max_batch=args.max_batch,
+                          max_delay=args.max_delay_ms / 1000, cache_size=args.cache_size))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import os
+import tempfile
+import weakref
+
+# Temporary files owned by a Streamlit session. Keep the SessionFile in
+# st.session_state: the file is unlinked as soon as nothing refers to the
+# object any more (the entry is replaced or popped, or the session's state is
+# released when it ends), and at interpreter exit for whatever is left.
+
+def unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+class SessionFile:
+    def __init__(self, suffix=''):
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as out:
+            self.path = out.name
+        weakref.finalize(self, unlink, self.path)
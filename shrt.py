@@ -1,69 +1,74 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon
-import schemdraw
-import schemdraw.elements as elm
-import sympy as sp
-
-def draw_phasor_diagram(Vr, angle, resistance, reactance, current):
-    # Convert angle to radians
-    angle_rad = np.radians(angle)
-    st.set_option('deprecation.showPyplotGlobalUse', False)
-    # Calculate the coordinates for Vs, Ir, and Ix
-    Vs_x = 0
-    Vs_y = 0
-
-    Vr_x = Vr * np.cos(angle_rad)
-    Vr_y = Vr * np.sin(angle_rad)
-
-    Ir_x = Vr_x + current
-    Ir_y = Vr_y
-
-    Ix_x = Ir_x
-    Ix_y = Ir_y + current
-
-    # Plot the phasor diagram
-    plt.figure(figsize=(8, 8))
-
-    # Plotting Vs vector with arrow
-    plt.arrow(0, 0, Ix_x, Ix_y, head_width=0.5, head_length=0.5, fc='blue', ec='blue', label='Vs')
-
-    # Plotting Vr vector with arrow
-    plt.arrow(0, 0, Vr_x, Vr_y, head_width=0.5, head_length=0.5, fc='green', ec='green', label='Vr')
-
-    plt.arrow(Vr_x, Vr_y, Ir_x - Vr_x, Ir_y - Vr_y, head_width=0.5, head_length=0.5, fc='red', ec='red', label='Ir')
-
-    plt.arrow(Ir_x, Ir_y, Ix_x - Ir_x, Ix_y - Ir_y, head_width=0.5, head_length=0.5, fc='purple', ec='purple', label='Ix')
-
-    # Add labels and legend
-    plt.text(Vr_x / 2, Vr_y / 2, 'Vr', color='green', fontsize=12, ha='right', va='bottom')
-    plt.text((Ir_x + Vr_x) / 2, (Ir_y + Vr_y) / 2, 'Ir', color='red', fontsize=12, ha='right', va='bottom')
-    plt.text((Ix_x + Ir_x) / 2, (Ix_y + Ir_y) / 2, 'Ix', color='purple', fontsize=12, ha='right', va='bottom')
-    plt.text(Ix_x / 2, Ix_y / 2, 'Vs', color='blue', fontsize=12, ha='right', va='bottom')
-
-    plt.xlabel('Real')
-    plt.ylabel('Imaginary')
-    plt.title('Phasor Diagram')
-    plt.axhline(0, color='black', linewidth=0.5)
-    plt.axvline(0, color='black', linewidth=0.5)
-    plt.grid(color='gray', linestyle='--', linewidth=0.5)
-    plt.legend()
-    st.pyplot()
+import rendering
+import metrics
+import phasor_grid
+import transmission
+
+def draw_phasor_diagram(Vr, angle, resistance, reactance, current, renderer='Plotly'):
+    # Coordinates for Vr, Ir and Ix come from the precomputed slider grid; Vr is in kV,
+    # current in A, so the I*R and I*X drops (Ω) are scaled to kV as well
+    with metrics.stage('compute'):
+        (Vr_x, Vr_y), (Ir_x, Ir_y), (Ix_x, Ix_y) = phasor_grid.lookup(Vr, angle, current, resistance / 1000, reactance / 1000)
+
+    if renderer == 'Plotly':
+        with metrics.stage('figure'):
+            fig = rendering.plotly_phasor((Vr_x, Vr_y), (Ir_x, Ir_y), (Ix_x, Ix_y))
+        with metrics.stage('render'):
+            st.plotly_chart(fig)
+        return
+
+    # Plot the phasor diagram on this session's figure, moving the existing artists
+    phasor = rendering.session_figure(st.session_state, 'phasor_figure', rendering.PhasorFigure)
+    with metrics.stage('figure'):
+        fig = phasor.update((Vr_x, Vr_y), (Ir_x, Ir_y), (Ix_x, Ix_y))
+    with metrics.stage('render'):
+        st.pyplot(fig)
 
 def main():
         st.title("Phasor Diagram of a Short Transmission Line")
-        Vr = st.slider("Enter Vr:", min_value=0, max_value=100, value=30, step=1)
+        renderer = st.sidebar.radio('Renderer', ['Plotly', 'Matplotlib (static)'])
+        Vr = st.slider("Enter Vr (kV, per phase):", min_value=0, max_value=100, value=30, step=1)
         angle = st.slider("Enter angle (degrees):", min_value=0, max_value=360, value=30, step=1)
-        current = st.slider("Enter current:", min_value=0, max_value=50, value=10, step=1)
-
-        resistance = 30
-        reactance = 20
-        draw_phasor_diagram(Vr, angle, resistance, reactance, current)
+        current = st.slider("Enter current (A):", min_value=0, max_value=50, value=10, step=1)
+
+        st.sidebar.header('Line Parameters')
+        length = st.sidebar.number_input('Length (km)', min_value=0.1, value=100.0)
+        r = st.sidebar.number_input('Resistance (Ω/km)', min_value=0.0, value=0.3)
+        x = st.sidebar.number_input('Reactance (Ω/km)', min_value=0.0, value=0.2)
+        b = st.sidebar.number_input('Shunt susceptance (μS/km)', min_value=0.0, value=0.0)
+        model = st.sidebar.selectbox('Line model', ['auto', 'short', 'nominal_pi', 'long'])
+
+        resistance = r * length
+        reactance = x * length
+        draw_phasor_diagram(Vr, angle, resistance, reactance, current, renderer)
+
+        # Receiving-end phasors: current on the reference, Vr leading it by the slider angle
+        with metrics.stage('compute'):
+            result = transmission.line_performance(Vr * 1000 * np.exp(1j * np.radians(angle)), current,
+                                                   complex(r, x), 1j * b * 1e-6, length, model)
+        st.subheader("Line Performance")
+        st.write(f"A = {complex(result['A']):.4f}, B = {complex(result['B']):.4f} Ω, "
+                 f"C = {complex(result['C']):.3e} S, D = {complex(result['D']):.4f}")
+        st.write(f"Sending-end voltage: {abs(result['Vs']) / 1000:.3f} kV at {np.degrees(np.angle(result['Vs'])):.2f}°")
+        st.write(f"Sending-end current: {abs(result['Is']):.3f} A at {np.degrees(np.angle(result['Is'])):.2f}°")
+        st.write(f"Regulation: {float(result['regulation']):.3f} %")
+        st.write(f"Efficiency: {float(result['efficiency']):.3f} %")
+
+        if st.checkbox("Animate angle sweep"):
+            step = st.slider("Sweep step (degrees):", min_value=1, max_value=30, value=5)
+            angles = np.arange(0, phasor_grid.ANGLE_MAX + 1, step)
+            with metrics.stage('figure'):
+                sweep = phasor_grid.angle_sweep(Vr, current, step, resistance / 1000, reactance / 1000)
+                fig = rendering.plotly_phasor_sweep(sweep, angles)
+            with metrics.stage('render'):
+                st.plotly_chart(fig)
 
 
 if __name__ == '__main__':
-    main()
+    with metrics.rerun('shrt'):
+        main()
+    metrics.panel()
 
 # Copyright text at the bottom
 st.markdown(
@@ -0,0 +1,75 @@
+import argparse
+import io
+import os
+import resource
+import sys
+import numpy as np
+import rendering
+
+# Replays slider changes against the per-session figures and serializes each
+# one to PNG the way st.pyplot does, sampling RSS to show that memory stays flat.
+# Run with --legacy to compare against the old pyplot figure-per-rerun code.
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        scale = 2**20 if sys.platform == 'darwin' else 2**10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def phasor_points(rng):
+    Vr, angle, current = rng.integers(0, 101), np.radians(rng.integers(0, 361)), rng.integers(0, 51)
+    Vr_xy = (Vr * np.cos(angle), Vr * np.sin(angle))
+    Ir_xy = (Vr_xy[0] + current, Vr_xy[1])
+    return Vr_xy, Ir_xy, (Ir_xy[0], Ir_xy[1] + current)
+
+def legacy_rerun(rng, dpi):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    Vr_xy, Ir_xy, Ix_xy = phasor_points(rng)
+    plt.figure(figsize=(8, 8))
+    plt.arrow(0, 0, Ix_xy[0], Ix_xy[1], head_width=0.5, head_length=0.5, fc='blue', ec='blue', label='Vs')
+    plt.arrow(0, 0, Vr_xy[0], Vr_xy[1], head_width=0.5, head_length=0.5, fc='green', ec='green', label='Vr')
+    plt.legend()
+    plt.savefig(io.BytesIO(), format='png', dpi=dpi)
+
+def main():
+    parser = argparse.ArgumentParser(description='RSS soak test for the phasor and triangle figures')
+    parser.add_argument('--reruns', type=int, default=10000)
+    parser.add_argument('--sample', type=int, default=500)
+    parser.add_argument('--dpi', type=int, default=72)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--max-growth-mb', type=float, default=20.0)
+    parser.add_argument('--legacy', action='store_true')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    session = {}
+    baseline = None
+    for rerun in range(1, args.reruns + 1):
+        if args.legacy:
+            legacy_rerun(rng, args.dpi)
+        else:
+            phasor = rendering.session_figure(session, 'phasor_figure', rendering.PhasorFigure)
+            phasor.update(*phasor_points(rng)).savefig(io.BytesIO(), format='png', dpi=args.dpi)
+
+            voltage, current, angle = rng.integers(0, 101), rng.integers(0, 101), rng.integers(0, 91)
+            p, q = voltage * current * np.cos(np.radians(angle)), voltage * current * np.sin(np.radians(angle))
+            triangle = rendering.session_figure(session, 'power_triangle_figure', rendering.power_triangle_figure)
+            triangle.update(p, q, voltage * current, angle).savefig(io.BytesIO(), format='png', dpi=args.dpi)
+
+        if rerun == args.warmup:
+            baseline = rss_mb()
+        if rerun % args.sample == 0:
+            print(f'rerun {rerun:>6}: rss {rss_mb():8.1f} MB', flush=True)
+
+    rendering.release_figures(session)
+    growth = rss_mb() - (baseline if baseline is not None else 0.0)
+    print(f'RSS growth after warmup: {growth:.1f} MB')
+    return 0 if growth <= args.max_growth_mb else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import hashlib
+import numpy as np
+
+# Memoized stages for the page scripts. Streamlit reruns a whole script on any
+# widget change, so each expensive step (compute, figure) is run through the
+# session's StageGraph under a name and is only re-executed when its inputs
+# change. A stage can also depend on earlier stages by name (deps); it then
+# reruns whenever one of them produced a new result, without hashing that
+# result. The graph lives in st.session_state, so every session has its own.
+
+def fingerprint(value):
+    # Comparable stand-in for a stage input; arrays are reduced to a digest of their bytes
+    if isinstance(value, np.ma.MaskedArray):
+        return ('masked', fingerprint(np.ma.getdata(value)), fingerprint(np.ma.getmaskarray(value)))
+    if isinstance(value, np.ndarray):
+        if value.dtype.hasobject:
+            return ('array', value.shape, fingerprint(value.tolist()))
+        return ('array', value.dtype.str, value.shape, hashlib.blake2b(np.ascontiguousarray(value)).digest())
+    if isinstance(value, dict):
+        return ('dict', tuple(sorted((key, fingerprint(item)) for key, item in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(fingerprint(item) for item in value))
+    return value
+
+class StageGraph:
+    def __init__(self):
+        self.entries = {}  # name -> (key, version, value)
+        self.ran = []
+        self.skipped = []
+
+    def begin(self):
+        self.ran, self.skipped = [], []
+
+    def version(self, name):
+        entry = self.entries.get(name)
+        return entry[1] if entry else 0
+
+    def previous(self, name):
+        # Last result of a stage whatever its inputs were, e.g. to warm-start a solver
+        entry = self.entries.get(name)
+        return entry[2] if entry else None
+
+    def run(self, name, func, *args, deps=(), **kwargs):
+        key = (fingerprint(args), fingerprint(kwargs), tuple(self.version(dep) for dep in deps))
+        entry = self.entries.get(name)
+        if entry is not None and entry[0] == key:
+            self.skipped.append(name)
+            return entry[2]
+
+        value = func(*args, **kwargs)
+        self.entries[name] = (key, self.version(name) + 1, value)
+        self.ran.append(name)
+        return value
+
+    def report(self):
+        total = len(self.ran) + len(self.skipped)
+        if total == 0:
+            return ''
+        return f'Stages: {len(self.skipped)} of {total} reused, {len(self.ran)} recomputed'
+
+def session_graph(state, key='stage_graph'):
+    # The session's graph, reset for a new rerun
+    if key not in state:
+        state[key] = StageGraph()
+    graph = state[key]
+    graph.begin()
+    return graph
+
+def session_report(state, key='stage_graph'):
+    graph = state.get(key)
+    return graph.report() if graph is not None else ''
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from soak_figures import rss_mb
+
+# Cold-start cost of each page of a multipage app: every measurement runs in a
+# fresh interpreter that imports Streamlit, selects the page through its radio
+# key and executes the script once, the way a new worker serves its first
+# request. The Streamlit import alone is measured as the baseline.
+
+HEAVY_MODULES = ('pandas', 'matplotlib', 'schemdraw', 'scipy', 'sympy', 'plotly')
+
+PAGES = ['Power Triangle', 'imped Triangle', 'Circuit Generator and Solver', 'Phasor Diagram']
+
+def child(app, page, page_key):
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter()
+
+    if app:
+        at = AppTest.from_file(app, default_timeout=120)
+        if page:
+            at.session_state[page_key] = page
+        at.run()
+        if at.exception:
+            raise RuntimeError(f'{page}: {at.exception[0].message}')
+
+    print(json.dumps({
+        'import_s': imported - start,
+        'total_s': time.perf_counter() - start,
+        'rss_mb': rss_mb(),
+        'modules': [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+def measure(app, page, page_key, repeat):
+    # Best of `repeat` fresh processes, so one slow disk read does not decide the result
+    command = [sys.executable, os.path.abspath(__file__), '--child', '--app', app or '', '--page-key', page_key]
+    if page:
+        command += ['--page', page]
+    runs = [json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+            for _ in range(repeat)]
+    return min(runs, key=lambda run: run['total_s'])
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start time and RSS per page of a Streamlit app')
+    parser.add_argument('--app', default='test5.py')
+    parser.add_argument('--page', action='append', help='page to measure (repeatable, default: every page)')
+    parser.add_argument('--page-key', default='page')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-seconds', type=float, default=3.0)
+    parser.add_argument('--max-rss-mb', type=float, default=250.0)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.app, args.page[0] if args.page else None, args.page_key)
+        return 0
+
+    baseline = measure(None, None, args.page_key, args.repeat)
+    print(f"{'page':<30} {'time s':>8} {'+page s':>8} {'rss MB':>8} {'+page MB':>9}  modules")
+    print(f"{'(streamlit only)':<30} {baseline['total_s']:8.2f} {0:8.2f} {baseline['rss_mb']:8.1f} {0:9.1f}  "
+          f"{', '.join(baseline['modules'])}")
+
+    over_budget = []
+    for page in args.page or PAGES:
+        result = measure(args.app, page, args.page_key, args.repeat)
+        print(f"{page:<30} {result['total_s']:8.2f} {result['total_s'] - baseline['total_s']:8.2f} "
+              f"{result['rss_mb']:8.1f} {result['rss_mb'] - baseline['rss_mb']:9.1f}  {', '.join(result['modules'])}")
+        if result['total_s'] > args.max_seconds or result['rss_mb'] > args.max_rss_mb:
+            over_budget.append(page)
+
+    if over_budget:
+        print(f"Over budget ({args.max_seconds} s, {args.max_rss_mb} MB): {', '.join(over_budget)}")
+    return 1 if over_budget else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,152 +1,114 @@
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon
-import schemdraw
-import schemdraw.elements as elm
-
-def calculate_power_triangle(voltage, current, phase_angle):
-    p = voltage * current * np.cos(np.radians(phase_angle))
-    q = voltage * current * np.sin(np.radians(phase_angle))
-    s = voltage * current
-    return p, q, s
-
-def calculate_imped_triangle(voltage, current, phase_angle):
-    res = (voltage / current) * np.cos(np.radians(phase_angle))
-    reac = (voltage / current) * np.sin(np.radians(phase_angle))
-    imped = np.sqrt(res**2 + reac**2)
-    return res, reac, imped
-
-def plot_power_triangle(p, q, s, angle):
-    fig, ax = plt.subplots(figsize=(6, 6))
-    ax.set_xlim(0, s + 5)
-    ax.set_ylim(0, s + 5)
-
-    vertices = [(0, 0), (p, 0), (p, q)]
-    triangle = Polygon(vertices, closed=True, edgecolor='black', linewidth=2, fill=None)
-    ax.add_patch(triangle)
-
-    ax.text(p / 2, -1, f'Real Power: {p:.2f}', ha='center')
-    ax.text(p + 1, q / 2, f'Reactive Power: {q:.2f}', va='center', rotation=90)
-    ax.text(p / 2, q / 2, f'Apparent Power: {s:.2f}', ha='center', va='center', rotation=angle)
-
-    ax.set_xlabel('Real Power')
-    ax.set_ylabel('Reactive Power')
-
-    st.pyplot(fig)
-
-def plot_imped_triangle(res, reac, imped, angle):
-    fig, ax = plt.subplots(figsize=(6, 6))
-    ax.set_xlim(0, imped + 5)
-    ax.set_ylim(0, imped + 5)
-
-    vertices = [(0, 0), (res, 0), (res, reac)]
-    triangle = Polygon(vertices, closed=True, edgecolor='black', linewidth=2, fill=None)
-    ax.add_patch(triangle)
-
-    ax.text(res / 2, -1, f'res: {res:.2f}', ha='center')
-    ax.text(res + 1, reac / 2, f'reac: {reac:.2f}', va='center', rotation=90)
-    ax.text(res / 2, reac / 2, f'imped: {imped:.2f}', ha='center', va='center', rotation=angle)
-
-    ax.set_xlabel('res')
-    ax.set_ylabel('reac')
-
-    st.pyplot(fig)
-
-def draw_circuit(components, voltage):
-    d = schemdraw.Drawing()
-    st.set_option('deprecation.showPyplotGlobalUse', False)
-    
-    comMap = {
-        'Resistor': (elm.Resistor, 'Ω'),
-        'Inductor': (elm.Inductor, 'H'),
-        'Capacitor': (elm.Capacitor, 'F')
-    }
-
-    totImp = 0
-    for i, component in enumerate(components):
-        compType, compVal = component['type'], component['value']
-        compClass, compUnit = comMap[compType]
-        
-        if i > 0:
-            d.add(elm.Dot())
-
-        compInst = compClass(label=f'{compVal}{compUnit}')
-        d.add(compInst)
-
-        imped = calculate_imped(compType, compVal)
-        totImp += imped
-
-    d.add(elm.SourceV(label=f'{voltage}V'))
-    d.draw()
-
-    return totImp
-
-def calculate_imped(compType, compVal):
-    omega = 2 * 3.14159265358979323846 
-
-    if compType == 'Resistor':
-        imped = compVal
-    elif compType == 'Inductor':
-        imped = complex(0, omega * compVal)
-    elif compType == 'Capacitor':
-        imped = complex(0, -1 / (omega * compVal))
-    else:
-        imped = 0
-
-    return imped
-
-def draw_phasor_diagram(Vr, angle, resistance, reactance, current):
-    # Convert angle to radians
-    angle_rad = np.radians(angle)
-    st.set_option('deprecation.showPyplotGlobalUse', False)
-    # Calculate the coordinates for Vs, Ir, and Ix
-    Vs_x = 0
-    Vs_y = 0
-
-    Vr_x = Vr * np.cos(angle_rad)
-    Vr_y = Vr * np.sin(angle_rad)
-
-    Ir_x = Vr_x + current
-    Ir_y = Vr_y
-
-    Ix_x = Ir_x
-    Ix_y = Ir_y + current
-
-    # Plot the phasor diagram
-    plt.figure(figsize=(8, 8))
-
-    # Plotting Vs vector with arrow
-    plt.arrow(0, 0, Ix_x, Ix_y, head_width=0.5, head_length=0.5, fc='blue', ec='blue', label='Vs')
-
-    # Plotting Vr vector with arrow
-    plt.arrow(0, 0, Vr_x, Vr_y, head_width=0.5, head_length=0.5, fc='green', ec='green', label='Vr')
-
-    # Plotting Ir vector with arrow
-    plt.arrow(Vr_x, Vr_y, Ir_x - Vr_x, Ir_y - Vr_y, head_width=0.5, head_length=0.5, fc='red', ec='red', label='Ir')
-
-    # Plotting Ix vector with arrow
-    plt.arrow(Ir_x, Ir_y, Ix_x - Ir_x, Ix_y - Ir_y, head_width=0.5, head_length=0.5, fc='purple', ec='purple', label='Ix')
-
-    # Add labels and legend
-    plt.text(Vr_x / 2, Vr_y / 2, 'Vr', color='green', fontsize=12, ha='right', va='bottom')
-    plt.text((Ir_x + Vr_x) / 2, (Ir_y + Vr_y) / 2, 'Ir', color='red', fontsize=12, ha='right', va='bottom')
-    plt.text((Ix_x + Ir_x) / 2, (Ix_y + Ir_y) / 2, 'Ix', color='purple', fontsize=12, ha='right', va='bottom')
-    plt.text(Ix_x / 2, Ix_y / 2, 'Vs', color='blue', fontsize=12, ha='right', va='bottom')
-
-    plt.xlabel('Real')
-    plt.ylabel('Imaginary')
-    plt.title('Phasor Diagram')
-    plt.axhline(0, color='black', linewidth=0.5)
-    plt.axvline(0, color='black', linewidth=0.5)
-    plt.grid(color='gray', linestyle='--', linewidth=0.5)
-    plt.legend()
-    st.pyplot()
-
+import circuit_ui
+import core
+import metrics
+import rendering
+import stages
+
+# pandas, matplotlib, schemdraw and scipy (through mna) are imported inside the
+# functions of the pages that use them, so a worker only pays for a page's
+# dependencies once that page is first opened
+#
+# Compute and figure steps go through the session's stages.StageGraph, so a
+# widget change only reruns the stages whose inputs it touches
+
+def matplotlib_png(key, factory, *args):
+    figure = rendering.session_figure(st.session_state, key, factory)
+    return rendering.figure_png(figure.update(*args))
+
+def plot_power_triangle(graph, p, q, s, angle, renderer='Plotly'):
+    if renderer == 'Plotly':
+        with metrics.stage('figure'):
+            fig = graph.run('power/plotly', rendering.plotly_power_triangle, p, q, s, angle)
+        with metrics.stage('render'):
+            st.plotly_chart(fig)
+        return
+    with metrics.stage('figure'):
+        png = graph.run('power/matplotlib', matplotlib_png, 'power_triangle_figure', rendering.power_triangle_figure,
+                        p, q, s, angle)
+    with metrics.stage('render'):
+        st.image(png, width='stretch')
+
+def plot_imped_triangle(graph, res, reac, imped, angle, renderer='Plotly'):
+    if renderer == 'Plotly':
+        with metrics.stage('figure'):
+            fig = graph.run('imped/plotly', rendering.plotly_imped_triangle, res, reac, imped, angle)
+        with metrics.stage('render'):
+            st.plotly_chart(fig)
+        return
+    with metrics.stage('figure'):
+        png = graph.run('imped/matplotlib', matplotlib_png, 'imped_triangle_figure', rendering.imped_triangle_figure,
+                        res, reac, imped, angle)
+    with metrics.stage('render'):
+        st.image(png, width='stretch')
+
+def bode_png(freqs, totImp, current, phase):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 6))
+    ax_mag, ax_phase = fig.subplots(2, 1, sharex=True)
+    ax_mag.loglog(freqs, np.abs(totImp), label='|Z| (Ω)')
+    ax_mag.loglog(freqs, current, label='|I| (A)')
+    ax_mag.set_ylabel('Magnitude')
+    ax_mag.grid(which='both', linestyle='--', linewidth=0.5)
+    ax_mag.legend()
+
+    ax_phase.semilogx(freqs, phase)
+    ax_phase.set_xlabel('Frequency (Hz)')
+    ax_phase.set_ylabel('Phase of Z (deg)')
+    ax_phase.grid(which='both', linestyle='--', linewidth=0.5)
+    return rendering.figure_png(fig)
+
+def impedance_sweep(components, f_start, f_stop, points):
+    # Everything but the current, which scales with the voltage: a voltage edit skips this stage
+    freqs = np.logspace(np.log10(f_start), np.log10(max(f_stop, f_start * 10)), points)
+    totImp, admittance, phase = core.frequency_sweep(components, 1.0, freqs)
+    return freqs, totImp, admittance, phase, core.find_resonance(freqs, totImp)
+
+def sweep_section(graph, components, voltage):
+    f_start = st.number_input('Sweep Start Frequency (Hz)', min_value=1e-3, value=1.0)
+    f_stop = st.number_input('Sweep Stop Frequency (Hz)', min_value=1e-3, value=1e6)
+    points = st.number_input('Sweep Points', min_value=2, step=1000, value=100000)
+
+    with metrics.stage('compute'):
+        freqs, totImp, admittance, phase, resonances = graph.run('sweep/impedance', impedance_sweep, components,
+                                                                 f_start, f_stop, int(points))
+    for freq in resonances:
+        st.write(f'Resonance at {freq:.4g} Hz')
+
+    with metrics.stage('figure'):
+        png = graph.run('sweep/figure', lambda voltage: bode_png(freqs, totImp, voltage * admittance, phase), voltage,
+                        deps=('sweep/impedance',))
+    with metrics.stage('render'):
+        st.image(png, width='stretch')
+
+def draw_phasor_diagram(graph, Vr, angle, resistance, reactance, current, renderer='Plotly'):
+    # Calculate the coordinates for Vr, Ir and Ix
+    with metrics.stage('compute'):
+        Vr_x, Vr_y, Ir_x, Ir_y, Ix_x, Ix_y = graph.run('phasor/points', core.phasor_points, Vr, angle, current)
+
+    if renderer == 'Plotly':
+        with metrics.stage('figure'):
+            fig = graph.run('phasor/plotly', rendering.plotly_phasor, (Vr_x, Vr_y), (Ir_x, Ir_y), (Ix_x, Ix_y))
+        with metrics.stage('render'):
+            st.plotly_chart(fig)
+        return
+
+    # Plot the phasor diagram on this session's figure, moving the existing artists
+    with metrics.stage('figure'):
+        png = graph.run('phasor/matplotlib', matplotlib_png, 'phasor_figure', rendering.PhasorFigure,
+                        (Vr_x, Vr_y), (Ir_x, Ir_y), (Ix_x, Ix_y))
+    with metrics.stage('render'):
+        st.image(png, width='stretch')
 
 def main():
+    graph = stages.session_graph(st.session_state)
     st.sidebar.markdown("Types of triangle or Circuit Generator : ")
-    option = st.sidebar.radio('Select',['Power Triangle', 'imped Triangle', 'Circuit Generator and Solver', 'Phasor Diagram'])
+    option = st.sidebar.radio('Select',['Power Triangle', 'imped Triangle', 'Circuit Generator and Solver', 'Phasor Diagram'], key='page')
+    page_figures = {'Power Triangle': 'power_triangle_figure', 'imped Triangle': 'imped_triangle_figure', 'Phasor Diagram': 'phasor_figure'}
+    renderer = st.sidebar.radio('Renderer', ['Plotly', 'Matplotlib (static)'])
+    rendering.release_figures(st.session_state, keep=(page_figures.get(option),) if renderer != 'Plotly' else ())
 
     if option == 'Power Triangle':
         st.subheader('Select the type of triangle in the sidebar: imped / Power')
@@ -154,9 +116,10 @@ def main():
         voltage = st.slider('Voltage', min_value=0, max_value=100, value=50)
         current = st.slider('Current', min_value=0, max_value=100, value=25)
         phase_angle = st.slider('Phase Angle', min_value=0, max_value=90, value=30)
-        p, q, s = calculate_power_triangle(voltage, current, phase_angle)
+        with metrics.stage('compute'):
+            p, q, s = graph.run('power/compute', core.calculate_power_triangle, voltage, current, phase_angle)
         st.subheader('Power Triangle')
-        plot_power_triangle(p, q, s, phase_angle)
+        plot_power_triangle(graph, p, q, s, phase_angle, renderer)
 
     elif option == 'imped Triangle':
         st.subheader('Select the type of triangle in the sidebar: imped / Power')
@@ -164,26 +127,27 @@ def main():
         voltage = st.slider('Voltage', min_value=0, max_value=100, value=10)
         current = st.slider('Current', min_value=0, max_value=100, value=5)
         phase_angle = st.slider('Phase Angle', min_value=0, max_value=90, value=0)
-        res, reac, imped = calculate_imped_triangle(voltage, current, phase_angle)
+        with metrics.stage('compute'):
+            res, reac, imped = graph.run('imped/compute', core.calculate_imped_triangle, voltage, current, phase_angle)
         st.subheader('imped Triangle')
-        plot_imped_triangle(res, reac, imped, phase_angle)
+        if np.ma.is_masked(imped):
+            st.write('imped is undefined at zero current')
+            return
+        plot_imped_triangle(graph, float(res), float(reac), float(imped), phase_angle, renderer)
 
     elif option == 'Circuit Generator and Solver':
         st.title('Circuit Diagram Generator and Solver')
-        st.sidebar.header('Number of Components')
-        num_components = st.sidebar.number_input('Number of Components', min_value=1, step=1, value=1)
-        components = []
-        for i in range(num_components):
-            st.sidebar.subheader(f'Component {i + 1}')
-            compType = st.sidebar.selectbox(f'Select Component Type {i + 1}', ['Resistor', 'Inductor', 'Capacitor'])
-            compVal = st.sidebar.number_input(f'{compType} Value {i + 1} ({compType})', min_value=0.001, step=0.001, value=0.01)
-            components.append({'type': compType, 'value': compVal})
-        voltage = st.number_input('Enter Voltage Across the Circuit (V)', min_value=0, step=1, value=10)
-        totImp = draw_circuit(components, voltage)
+        netlist, key = circuit_ui.load_netlist(st.sidebar.file_uploader('Upload SPICE Netlist', type=['cir', 'sp', 'net', 'txt']))
+        components = circuit_ui.components_editor(netlist, key)
+        if not components:
+            return
+        voltage = st.number_input('Enter Voltage Across the Circuit (V)', min_value=0.0, step=1.0, value=circuit_ui.source_voltage(netlist))
+        totImp = circuit_ui.draw_circuit(components, voltage, graph)
         current = voltage / totImp
         st.write(f'Total imped: {totImp:.2f} Ω')
         st.write(f'Current: {current:.2f} A')
-        st.pyplot()
+        if st.checkbox('Frequency Sweep'):
+            sweep_section(graph, components, voltage)
 
     elif option == 'Phasor Diagram':
         st.title("Phasor Diagram of a Short Transmission Line")
@@ -198,10 +162,13 @@ def main():
         reactance = 20
 
     # Draw phasor diagram
-        draw_phasor_diagram(Vr, angle, resistance, reactance, current)
+        draw_phasor_diagram(graph, Vr, angle, resistance, reactance, current, renderer)
 
 if __name__ == '__main__':
-    main()
+    with metrics.rerun('test5'):
+        main()
+    st.sidebar.caption(stages.session_report(st.session_state))
+    metrics.panel()
 
 # Copyright text at the bottom
 st.sidebar.markdown(
@@ -0,0 +1,76 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import core
+import mna
+
+# Monte Carlo tolerance analysis. Component values are drawn as a (samples,
+# components) array and the circuit is evaluated for every row at once: the
+# series chain in closed form, netlists through the batched MNA solve in
+# chunks, optionally spread over a process pool.
+
+DISTRIBUTIONS = ('uniform', 'normal')
+
+PERCENTILES = (1, 5, 50, 95, 99)
+
+def sample_values(values, tolerances, distributions='uniform', samples=1_000_000, rng=None):
+    # tolerances are fractions (0.05 for ±5%); a normal tolerance is read as 3 sigma
+    rng = np.random.default_rng(rng)
+    values = np.asarray(values, dtype=float)
+    tolerances = np.broadcast_to(np.asarray(tolerances, dtype=float), values.shape)
+    normal = np.broadcast_to(np.asarray(distributions) == 'normal', values.shape)
+
+    unknown = set(np.atleast_1d(distributions)) - set(DISTRIBUTIONS)
+    if unknown:
+        raise ValueError(f"Unknown distribution: {unknown.pop()}")
+
+    spread = np.where(normal, rng.standard_normal((samples, len(values))) / 3,
+                      rng.uniform(-1, 1, (samples, len(values))))
+    return values * (1 + tolerances * spread)
+
+def series_monte_carlo(components, voltage, tolerances, distributions='uniform', samples=1_000_000, freq=1.0,
+                       rng=None):
+    types = np.array([component['type'] for component in components], dtype=object)
+    compVals = sample_values([component['value'] for component in components], tolerances, distributions,
+                             samples, rng)
+
+    # Same equivalents as core.series_impedance, with one row per sample
+    omega = 2 * np.pi * freq
+    totImp = compVals[:, types == 'Resistor'].sum(axis=1) + 1j * omega * compVals[:, types == 'Inductor'].sum(axis=1)
+    if np.any(types == 'Capacitor'):
+        totImp = totImp + core.calculate_imped('Capacitor', 1 / np.sum(1 / compVals[:, types == 'Capacitor'], axis=1),
+                                               freq)
+    return {'values': compVals, 'imped': totImp, 'current': voltage / totImp}
+
+def netlist_chunk(netlist, tolerances, distributions, samples, seed, omega):
+    compVals = sample_values([comp['value'] for comp in netlist], tolerances, distributions, samples, seed)
+    result = mna.solve_netlist_batch(netlist, compVals, omega)
+    return result['voltages'], result['currents']
+
+def netlist_monte_carlo(netlist, tolerances, distributions='uniform', samples=100_000, omega=2 * np.pi,
+                        chunksize=20_000, workers=1, seed=None):
+    # Each chunk draws from its own spawned seed, so results do not depend on the worker count
+    sizes = [min(chunksize, samples - start) for start in range(0, samples, chunksize)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(netlist, tolerances, distributions, size, chunk_seed, omega) for size, chunk_seed in zip(sizes, seeds)]
+
+    if workers <= 1:
+        chunks = [netlist_chunk(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(netlist_chunk, *zip(*args)))
+
+    pattern = mna.build_pattern(mna.netlist_topology(netlist))
+    return {
+        'node_names': pattern['node_names'],
+        'branch_names': [comp.get('name', f"{comp['type']} {k + 1}") for k, comp in enumerate(netlist)],
+        'voltages': np.concatenate([voltages for voltages, _ in chunks]),
+        'currents': np.concatenate([currents for _, currents in chunks]),
+    }
+
+def percentile_bands(samples, percentiles=PERCENTILES):
+    # Percentiles along the sample axis: one row per percentile, one column per quantity
+    return np.percentile(samples, percentiles, axis=0)
+
+def histogram(samples, bins=100):
+    counts, edges = np.histogram(samples, bins=bins)
+    return counts, (edges[:-1] + edges[1:]) / 2
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Length limits (km) used by model='auto': short below 80 km, nominal pi up to 240 km, long above
+SHORT_LIMIT, MEDIUM_LIMIT = 80.0, 240.0
+
+def abcd_parameters(z, y, length, model='auto'):
+    # z: series impedance (Ω/km), y: shunt admittance (S/km); everything broadcasts
+    z, y = np.asarray(z, dtype=complex), np.asarray(y, dtype=complex)
+    length = np.asarray(length, dtype=float)
+    Z, Y = z * length, y * length
+    one = np.ones(np.broadcast(Z, Y).shape, dtype=complex)
+
+    short = (one, Z * one, 0 * one, one)
+
+    half = Z * Y / 2
+    nominal_pi = (1 + half, Z * one, Y * (1 + half / 2), 1 + half)
+
+    # Exact long line; with y == 0 this reduces to the short line, so guard the division
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma_l = np.sqrt(Z * Y)
+        Zc = np.sqrt(z / y) * one
+        sinh = np.sinh(gamma_l)
+        lossless = np.abs(gamma_l) < 1e-12
+        long = (np.cosh(gamma_l) * one,
+                np.where(lossless, Z, Zc * sinh),
+                np.where(lossless, Y, sinh / Zc),
+                np.cosh(gamma_l) * one)
+
+    if model == 'short':
+        return short
+    if model == 'nominal_pi':
+        return nominal_pi
+    if model == 'long':
+        return long
+    if model != 'auto':
+        raise ValueError(f"Unknown line model: {model}")
+
+    is_short = length < SHORT_LIMIT
+    is_medium = (length >= SHORT_LIMIT) & (length <= MEDIUM_LIMIT)
+    return tuple(np.where(is_short, s, np.where(is_medium, m, l)) for s, m, l in zip(short, nominal_pi, long))
+
+def receiving_current(Vr, P, pf, lagging=True):
+    # Per-phase current phasor for a three-phase load P (W) at line-to-line voltage Vr (V), Vr on the reference
+    pf = np.asarray(pf, dtype=float)
+    phi = np.arccos(np.clip(pf, -1, 1)) * np.where(lagging, -1, 1)
+    magnitude = np.asarray(P, dtype=float) / (np.sqrt(3) * np.asarray(Vr, dtype=float) * pf)
+    return magnitude * np.exp(1j * phi)
+
+def line_performance(Vr, Ir, z, y, length, model='auto'):
+    # Vr and Ir are per-phase receiving-end phasors (V, A)
+    A, B, C, D = abcd_parameters(z, y, length, model)
+    Vr, Ir = np.asarray(Vr, dtype=complex), np.asarray(Ir, dtype=complex)
+    Vs = A * Vr + B * Ir
+    Is = C * Vr + D * Ir
+
+    # Regulation uses the no-load receiving voltage |Vs| / |A|
+    with np.errstate(divide='ignore', invalid='ignore'):
+        regulation = (np.abs(Vs) / np.abs(A) - np.abs(Vr)) / np.abs(Vr) * 100
+        Pr = 3 * np.real(Vr * np.conj(Ir))
+        Ps = 3 * np.real(Vs * np.conj(Is))
+        efficiency = Pr / Ps * 100
+
+    return {
+        'A': A, 'B': B, 'C': C, 'D': D, 'Vs': Vs, 'Is': Is,
+        'regulation': regulation, 'efficiency': efficiency, 'Pr': Pr, 'Ps': Ps,
+    }
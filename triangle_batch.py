@@ -0,0 +1,131 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import core
+
+# Power and impedance triangles for metering exports too large to load at once:
+# the input is read in fixed-size chunks, each chunk is one vectorized call into
+# core, and results are appended to the output as soon as they are ready, so
+# memory depends on the chunk size and worker count, never on the file size.
+
+INPUT_COLUMNS = ('voltage', 'current', 'phase')
+OUTPUT_COLUMNS = ('p', 'q', 's', 'res', 'reac', 'imped')
+
+def is_parquet(path):
+    return os.path.splitext(str(path))[1].lower() in ('.parquet', '.pq')
+
+def read_chunks(path, columns, chunksize):
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=list(columns)):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=list(columns), chunksize=chunksize)
+
+def triangle_chunk(voltage, current, phase):
+    # Rows with current == 0 have no impedance; the masked values are written as NaN
+    p, q, s = core.calculate_power_triangle(voltage, current, phase)
+    res, reac, imped = core.calculate_imped_triangle(voltage, current, phase)
+    return pd.DataFrame({
+        'voltage': voltage, 'current': current, 'phase': phase, 'p': p, 'q': q, 's': s,
+        'res': res.filled(np.nan), 'reac': reac.filled(np.nan), 'imped': imped.filled(np.nan),
+    })
+
+def render_chunk(arrays, as_csv):
+    # Formatting CSV text is the slow part of a CSV run, so it happens in the worker too
+    frame = triangle_chunk(*arrays)
+    return len(frame), frame.to_csv(header=False, index=False) if as_csv else frame
+
+class ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = None
+        self.first = True
+
+    def write(self, frame):
+        if isinstance(frame, str):
+            with open(self.path, 'w' if self.first else 'a', newline='') as out:
+                if self.first:
+                    out.write(','.join(INPUT_COLUMNS + OUTPUT_COLUMNS) + '\n')
+                out.write(frame)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self.parquet is None:
+                self.parquet = pq.ParquetWriter(self.path, table.schema)
+            self.parquet.write_table(table)
+        self.first = False
+
+    def close(self):
+        if self.parquet is not None:
+            self.parquet.close()
+
+def process_file(source, out_path, columns=INPUT_COLUMNS, chunksize=1_000_000, workers=1,
+                 progress=None):
+    voltage_col, current_col, phase_col = columns
+    arrays = ((chunk[voltage_col].to_numpy(dtype=float), chunk[current_col].to_numpy(dtype=float),
+               chunk[phase_col].to_numpy(dtype=float)) for chunk in read_chunks(source, columns, chunksize))
+
+    writer = ChunkWriter(out_path)
+    as_csv = not is_parquet(out_path)
+    rows = 0
+
+    def emit(result):
+        nonlocal rows
+        count, payload = result
+        writer.write(payload)
+        rows += count
+        if progress:
+            progress(rows)
+
+    try:
+        if workers <= 1:
+            for chunk in arrays:
+                emit(render_chunk(chunk, as_csv))
+        else:
+            # At most two chunks per worker are in flight, and results are written in input order
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for chunk in arrays:
+                    pending.append(pool.submit(render_chunk, chunk, as_csv))
+                    while len(pending) >= 2 * workers or (pending and pending[0].done()):
+                        emit(pending.popleft().result())
+                while pending:
+                    emit(pending.popleft().result())
+    finally:
+        writer.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Power and impedance triangles for large CSV or Parquet files')
+    parser.add_argument('source', help='input .csv or .parquet file')
+    parser.add_argument('output', help='output .csv or .parquet file')
+    parser.add_argument('--voltage', default='voltage', help='voltage column')
+    parser.add_argument('--current', default='current', help='current column')
+    parser.add_argument('--phase', default='phase', help='phase angle column (degrees)')
+    parser.add_argument('--chunksize', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def progress(rows):
+        elapsed = time.perf_counter() - start
+        print(f'{rows:>12,} rows  {rows / elapsed:>12,.0f} rows/s', file=sys.stderr, flush=True)
+
+    rows = process_file(args.source, args.output, (args.voltage, args.current, args.phase),
+                        args.chunksize, args.workers, progress)
+    elapsed = time.perf_counter() - start
+    print(f'{rows:,} rows in {elapsed:.2f} s ({rows / max(elapsed, 1e-9):,.0f} rows/s) -> {args.output}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import core
+
+# Power triangle from sampled voltage and current waveforms. The sample file is
+# memory-mapped and cut into windows of whole fundamental cycles; each block of
+# windows is one batched rFFT per channel, so the phase angle comes from the
+# waveforms instead of the user and RAM holds one block at a time.
+
+def open_waveform(path, dtype='float32', channels=2):
+    # .npy files carry their own dtype and shape; anything else is raw interleaved samples
+    if os.path.splitext(str(path))[1].lower() == '.npy':
+        samples = np.load(path, mmap_mode='r')
+    else:
+        samples = np.memmap(path, dtype=dtype, mode='r')
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels)
+
+    if samples.ndim != 2:
+        raise ValueError(f"Expected a 2-D sample array, got shape {samples.shape}")
+    # Always (channels, count); interleaved files become a strided view, nothing is copied
+    return samples.T if samples.shape[0] > samples.shape[1] else samples
+
+def window_length(fs, f0, cycles):
+    return int(round(cycles * fs / f0))
+
+def harmonic_bins(fs, f0, n, harmonics):
+    bins = np.rint(np.arange(1, harmonics + 1) * f0 * n / fs).astype(int)
+    return bins[bins < n // 2]
+
+def analyze_windows(v, i, fs, f0, harmonics=15):
+    # v and i are (windows, n) blocks; every result has one row per window
+    n = v.shape[-1]
+    bins = harmonic_bins(fs, f0, n, harmonics)
+
+    # Time-domain products give the totals (all frequencies, DC included)
+    vrms = np.sqrt(np.einsum('ij,ij->i', v, v, dtype=float) / n)
+    irms = np.sqrt(np.einsum('ij,ij->i', i, i, dtype=float) / n)
+    p = np.einsum('ij,ij->i', v, i, dtype=float) / n
+    s = vrms * irms
+
+    # RMS phasors of each harmonic; Q is the sum of the per-harmonic reactive powers
+    V = np.fft.rfft(v, axis=-1)[:, bins] * (np.sqrt(2) / n)
+    I = np.fft.rfft(i, axis=-1)[:, bins] * (np.sqrt(2) / n)
+    harmonic_power = V * np.conj(I)
+    q = harmonic_power.imag.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pf = np.where(s > 0, p / s, np.nan)
+    phase = np.degrees(np.angle(harmonic_power[:, 0])) if len(bins) else np.full(len(p), np.nan)
+    thd_v, thd_i = (np.ma.filled(core.total_harmonic_distortion(X).astype(float), np.nan) if len(bins)
+                    else np.full(len(p), np.nan) for X in (V, I))
+
+    return {
+        'vrms': vrms, 'irms': irms, 'p': p, 'q': q, 's': s, 'd': core.distortion_power(p, q, s), 'pf': pf,
+        'phase': phase, 'thd_v': thd_v, 'thd_i': thd_i,
+        'V': V, 'I': I, 'P_h': harmonic_power.real, 'Q_h': harmonic_power.imag,
+    }
+
+def analyze(samples, fs, f0=50.0, cycles=10, harmonics=15, channels=(0, 1), block_windows=4096):
+    # samples: (channels, count) array as returned by open_waveform, typically memory-mapped
+    v_all, i_all = samples[channels[0]], samples[channels[1]]
+
+    n = window_length(fs, f0, cycles)
+    windows = len(v_all) // n
+    if windows == 0:
+        raise ValueError(f"Need at least {n} samples for one {cycles}-cycle window")
+
+    blocks = []
+    for start in range(0, windows, block_windows):
+        stop = min(start + block_windows, windows)
+        v = np.asarray(v_all[start * n:stop * n]).reshape(-1, n)
+        i = np.asarray(i_all[start * n:stop * n]).reshape(-1, n)
+        blocks.append(analyze_windows(v, i, fs, f0, harmonics))
+
+    result = {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
+    result['time'] = np.arange(windows) * n / fs
+    result['harmonics'] = harmonic_bins(fs, f0, n, harmonics) * fs / n / f0
+    return result
+
+def analyze_file(path, fs, f0=50.0, cycles=10, harmonics=15, dtype='float32', channels=2, block_windows=4096):
+    return analyze(open_waveform(path, dtype, channels), fs, f0, cycles, harmonics, block_windows=block_windows)
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-window RMS, P, Q, S and harmonics of sampled V/I waveforms')
+    parser.add_argument('path', help='.npy file or raw interleaved V/I samples')
+    parser.add_argument('--fs', type=float, required=True, help='sample rate (Hz)')
+    parser.add_argument('--f0', type=float, default=50.0, help='fundamental frequency (Hz)')
+    parser.add_argument('--cycles', type=int, default=10, help='fundamental cycles per window')
+    parser.add_argument('--harmonics', type=int, default=15)
+    parser.add_argument('--dtype', default='float32', help='sample type of raw files')
+    parser.add_argument('--channels', type=int, default=2, help='interleaved channels in raw files')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    samples = open_waveform(args.path, args.dtype, args.channels)
+    result = analyze(samples, args.fs, args.f0, args.cycles, args.harmonics)
+    elapsed = time.perf_counter() - start
+
+    count = samples.shape[1] * 2
+    print(f"{len(result['p'])} windows, mean P {result['p'].mean():.4g} W, Q {result['q'].mean():.4g} var, "
+          f"S {result['s'].mean():.4g} VA, pf {np.nanmean(result['pf']):.4f}")
+    print(f'{count:,} samples in {elapsed:.2f} s ({count / max(elapsed, 1e-9) / 1e6:.1f} M samples/s)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())